@@ -0,0 +1,111 @@
+import csv
+import json
+import multiprocessing
+import os
+import sys
+
+import degrees
+
+
+def main():
+    if not 2 <= len(sys.argv) <= 4:
+        sys.exit("Usage: python batch.py directory [queries.csv] [workers]")
+    directory = sys.argv[1]
+    filename = sys.argv[2] if len(sys.argv) >= 3 else "-"
+    workers = int(sys.argv[3]) if len(sys.argv) == 4 else os.cpu_count()
+
+    # Load data once, before forking, so workers share it copy-on-write
+    degrees.load_data(directory, compact=True)
+
+    if filename == "-":
+        queries = read_queries(sys.stdin)
+    else:
+        with open(filename, encoding="utf-8") as f:
+            queries = read_queries(f)
+
+    for result in answer_queries(queries, workers):
+        print(json.dumps(result), flush=True)
+
+
+def read_queries(f):
+    """
+    Read (source, target) pairs from CSV rows of two person ids or names.
+    """
+    return [
+        (row[0].strip(), row[1].strip())
+        for row in csv.reader(f)
+        if len(row) >= 2
+    ]
+
+
+def answer_queries(queries, workers):
+    """
+    Yield one result dictionary per query, running one breadth-first
+    search per unique source across a pool of `workers` processes.
+    Results are yielded as each source finishes, not in input order.
+    """
+    # Sources are grouped by the person they resolve to, so a name and
+    # an id for the same person share a search; unknown sources are
+    # kept apart by their original string
+    groups = {}
+    for source, target in queries:
+        source_id = degrees.resolve_person(source)
+        key = source if source_id is None else source_id
+        groups.setdefault(key, (source_id, []))[1].append((source, target))
+    groups = list(groups.values())
+
+    if workers <= 1:
+        for group in groups:
+            yield from answer_group(group)
+        return
+
+    context = multiprocessing.get_context("fork")
+    with context.Pool(workers) as pool:
+        for results in pool.imap_unordered(answer_group, groups):
+            yield from results
+
+
+def answer_group(group):
+    """
+    Answer every query of a (source_id, queries) group, whose sources
+    all resolve to `source_id`, with a single search of the compact
+    graph and return the results as a list, keeping each query's
+    source and target as given.
+    """
+    source_id, queries = group
+    target_ids = {
+        target: degrees.resolve_person(target) for _, target in queries
+    }
+
+    found = [
+        person_id for person_id in target_ids.values()
+        if person_id is not None and source_id is not None
+        and degrees.connected(source_id, person_id)
+    ]
+    paths = {}
+    if source_id is not None and found:
+        paths = degrees.graph.shortest_paths(source_id, found)
+
+    results = []
+    for source, target in queries:
+        result = {"source": source, "target": target}
+        target_id = target_ids[target]
+        if source_id is None:
+            result["error"] = "Source not found."
+        elif target_id is None:
+            result["error"] = "Target not found."
+        else:
+            result["source_id"] = source_id
+            result["target_id"] = target_id
+            path = paths.get(target_id)
+            result["degrees"] = None if path is None else len(path)
+            result["path"] = None if path is None else [
+                {"movie_id": movie_id, "person_id": person_id}
+                for movie_id, person_id in path
+            ]
+        results.append(result)
+    return results
+
+
+if __name__ == "__main__":
+    main()
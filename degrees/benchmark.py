@@ -0,0 +1,146 @@
+import random
+import sys
+import time
+import tracemalloc
+
+import degrees
+from graph import CompactGraph
+from landmarks import LandmarkIndex
+
+
+def main():
+    if len(sys.argv) > 3:
+        sys.exit("Usage: python benchmark.py [directory] [pairs]")
+    directory = sys.argv[1] if len(sys.argv) >= 2 else "large"
+    n = int(sys.argv[2]) if len(sys.argv) == 3 else 100
+
+    print("Loading data...")
+    # Without the snapshot, so only the dicts are built and measured
+    tracemalloc.start()
+    degrees.load_data(directory, cache=False)
+    dict_bytes = tracemalloc.get_traced_memory()[0]
+    graph = CompactGraph.from_data(degrees.people, degrees.movies)
+    graph_bytes = tracemalloc.get_traced_memory()[0] - dict_bytes
+    tracemalloc.stop()
+    print("Data loaded.")
+    print(f"Dict representation: {dict_bytes / 2 ** 20:.1f} MiB")
+    print(f"Compact graph: {graph_bytes / 2 ** 20:.1f} MiB "
+          f"({graph.nbytes() / 2 ** 20:.1f} MiB of CSR buffers)")
+
+    start = time.perf_counter()
+    index = LandmarkIndex.build(graph)
+    print(f"Landmark index: {time.perf_counter() - start:.1f}s to build")
+
+    random.seed(0)
+    person_ids = list(degrees.people)
+    pairs = [
+        (random.choice(person_ids), random.choice(person_ids))
+        for _ in range(n)
+    ]
+
+    # All four skip pairs in different components the same way:
+    # the first two through `degrees.shortest_path`
+    searches = {
+        "bfs": lambda s, t: degrees.shortest_path(s, t),
+        "bidirectional": lambda s, t: degrees.shortest_path(
+            s, t, bidirectional=True
+        ),
+        "compact": pruned(graph.shortest_path),
+        "landmark": pruned(index.shortest_path),
+    }
+    unconnected = sum(not degrees.connected(s, t) for s, t in pairs)
+    print(f"Pairs in different components: {unconnected} of {n}")
+    for name, search in searches.items():
+        expansions, seconds, lengths = run(search, pairs)
+        print(f"{name}:")
+        if expansions:
+            print(f"  Expansions: {expansions} "
+                  f"({expansions / n:.1f} per query)")
+        print(f"  Time: {seconds:.3f}s ({seconds / n * 1000:.2f}ms per query)")
+        print(f"  Connected: {sum(length is not None for length in lengths)} of {n}")
+
+    start = time.perf_counter()
+    for source, target in pairs:
+        index.bounds(source, target)
+    seconds = time.perf_counter() - start
+    print("landmark bounds:")
+    print(f"  Time: {seconds:.3f}s ({seconds / n * 1000:.3f}ms per query)")
+
+    time_lookups(n)
+
+
+def time_lookups(n):
+    """
+    Print the time `degrees.search_names` takes for exact names,
+    prefixes and misspellings of `n` random names.
+    """
+    start = time.perf_counter()
+    if degrees.name_index is None:
+        degrees.search_names("")
+    print(f"Name index: {time.perf_counter() - start:.3f}s to build")
+
+    random.seed(0)
+    sample = random.sample(sorted(degrees.names), min(n, len(degrees.names)))
+    queries = {
+        "exact": sample,
+        "prefix": [name[:max(1, len(name) // 2)] for name in sample],
+        "misspelled": [
+            name[:len(name) // 2] + "#" + name[len(name) // 2 + 1:]
+            for name in sample
+        ],
+    }
+    for name, batch in queries.items():
+        start = time.perf_counter()
+        for query in batch:
+            degrees.search_names(query)
+        seconds = time.perf_counter() - start
+        print(f"{name} name lookup:")
+        print(f"  Time: {seconds:.3f}s "
+              f"({seconds / len(batch) * 1000:.3f}ms per query)")
+
+
+def pruned(search):
+    """
+    Return `search` with the component check `degrees.shortest_path`
+    makes before searching.
+    """
+    def search_connected(source, target):
+        if not degrees.connected(source, target):
+            return None
+        return search(source, target)
+    return search_connected
+
+
+def run(search, pairs):
+    """
+    Run `search` over every pair, counting calls to
+    `neighbors_for_person` as node expansions.
+
+    Return the expansion count, wall time and path lengths.
+    """
+    neighbors_for_person = degrees.neighbors_for_person
+    expansions = 0
+
+    def counting(person_id):
+        nonlocal expansions
+        expansions += 1
+        return neighbors_for_person(person_id)
+
+    degrees.neighbors_for_person = counting
+    try:
+        lengths = []
+        start = time.perf_counter()
+        for source, target in pairs:
+            if source == target:
+                lengths.append(0)
+                continue
+            path = search(source, target)
+            lengths.append(None if path is None else len(path))
+        seconds = time.perf_counter() - start
+    finally:
+        degrees.neighbors_for_person = neighbors_for_person
+    return expansions, seconds, lengths
+
+
+if __name__ == "__main__":
+    main()
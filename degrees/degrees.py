@@ -1,8 +1,14 @@
 import csv
+import resource
 import sys
+import time
 
 from flask import current_app
 
+import landmarks
+import lookup
+import snapshot
+from graph import CompactGraph
 from util import Node, StackFrontier, QueueFrontier
 
 # Maps names to a set of corresponding person_ids
@@ -11,47 +17,211 @@ names = {}
 # Maps person_ids to a dictionary of: name, birth, movies (a set of movie_ids)
 people = {}
 
-# Maps movie_ids to a dictionary of: title, year, stars (a set of person_ids)
+# Maps movie_ids to a dictionary of: title, stars (a set of person_ids)
 movies = {}
 
+# Integer-indexed CSR copy of the star relation, if built
+graph = None
 
-def load_data(directory):
+# Distances from landmark people over `graph`, if loaded
+landmark_index = None
+
+# Maps person_ids to the label of their connected component
+components = {}
+
+# Maps component labels to the number of people in them
+component_sizes = {}
+
+# Prefix and fuzzy index over `names`, loaded with the snapshot
+# or otherwise built on first search
+name_index = None
+
+# How the last `load_data` went: source, rows, seconds, rows_per_second
+# and peak_rss (in bytes)
+load_stats = {}
+
+
+def load_data(directory, compact=False, cache=True, landmark=False):
     """
     Load data from CSV files into memory.
+
+    If `compact` is true, also build a `CompactGraph` for searching.
+
+    If `landmark` is true, also load (or build and save) a
+    `LandmarkIndex` over the compact graph for distance bounds
+    and landmark-guided search. Implies `compact`.
+
+    If `cache` is true, load from the binary snapshot in `directory`
+    instead when it is up to date with the CSV files, and otherwise
+    write a fresh one after parsing them. The snapshot includes the
+    name index used by `search_names`, so it is ready from the start.
     """
+    global graph, landmark_index, name_index
+
+    compact = compact or landmark
+    landmark_index = None
+    name_index = None
+    start = time.perf_counter()
+
+    loaded = snapshot.load(directory) if cache else None
+    if loaded is not None:
+        names.update(loaded[0])
+        people.update(loaded[1])
+        movies.update(loaded[2])
+        graph = loaded[3] if compact else None
+        name_index = loaded[4]
+        rows = {}
+        seconds = time.perf_counter() - start
+    else:
+        rows = load_csv(directory)
+        seconds = time.perf_counter() - start
+        graph, name_index = build_graph(directory, compact, cache)
+
+    load_stats.clear()
+    load_stats.update({
+        "source": "csv" if loaded is None else "snapshot",
+        "rows": rows,
+        "seconds": seconds,
+        "rows_per_second": sum(rows.values()) / seconds if seconds else 0,
+        "peak_rss": peak_rss(),
+    })
+
+    label_components()
+
+    if landmark:
+        landmark_index = landmarks.load_index(directory, graph)
+
+
+def build_graph(directory, compact, cache):
+    """
+    Build the compact graph if it is wanted or needs snapshotting,
+    and write the snapshot, with a name index, if `cache` is true.
+
+    Return the graph if `compact` is true, and the name index if
+    one was built.
+    """
+    compact_graph = None
+    index = None
+    if compact or cache:
+        compact_graph = CompactGraph.from_data(people, movies)
+    if cache:
+        index = lookup.NameIndex(names, people)
+        try:
+            snapshot.save(directory, names, people, movies, compact_graph,
+                          index)
+        except OSError:
+            pass
+    return (compact_graph if compact else None), index
+
+
+def label_components():
+    """
+    Fill in `components` and `component_sizes` by union-find over
+    the stars of each movie. A person's label is the person_id at the
+    root of their component.
+    """
+    parent = {person_id: person_id for person_id in people}
+
+    def find(person_id):
+        while parent[person_id] != person_id:
+            parent[person_id] = parent[parent[person_id]]
+            person_id = parent[person_id]
+        return person_id
+
+    for movie in movies.values():
+        root = None
+        for person_id in movie["stars"]:
+            other = find(person_id)
+            if root is None:
+                root = other
+            elif other != root:
+                parent[other] = root
+
+    components.clear()
+    component_sizes.clear()
+    for person_id in people:
+        label = find(person_id)
+        components[person_id] = label
+        component_sizes[label] = component_sizes.get(label, 0) + 1
+
+
+def connected(source, target):
+    """
+    Returns whether two people are in the same connected component.
+    """
+    return components[source] == components[target]
+
+
+def load_csv(directory):
+    """
+    Parse the CSV files in `directory` into `names`, `people` and `movies`,
+    keeping only the columns used and interning the repeated ids.
+
+    Return the number of rows read from each file.
+    """
+    rows = {}
+
     # Load people
-    with open(f"{directory}/people.csv", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
+    with open(f"{directory}/people.csv", encoding="utf-8", newline="") as f:
+        reader = csv.reader(f)
+        id_, name_, birth_ = columns(next(reader), "id", "name", "birth")
+        count = 0
         for row in reader:
-            people[row["id"]] = {
-                "name": row["name"],
-                "birth": row["birth"],
+            person_id = sys.intern(row[id_])
+            name = row[name_]
+            people[person_id] = {
+                "name": name,
+                "birth": row[birth_],
                 "movies": set()
             }
-            if row["name"].lower() not in names:
-                names[row["name"].lower()] = {row["id"]}
-            else:
-                names[row["name"].lower()].add(row["id"])
+            names.setdefault(name.lower(), set()).add(person_id)
+            count += 1
+        rows["people"] = count
 
     # Load movies
-    with open(f"{directory}/movies.csv", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
+    with open(f"{directory}/movies.csv", encoding="utf-8", newline="") as f:
+        reader = csv.reader(f)
+        id_, title_ = columns(next(reader), "id", "title")
+        count = 0
         for row in reader:
-            movies[row["id"]] = {
-                "title": row["title"],
-                "year": row["year"],
+            movies[sys.intern(row[id_])] = {
+                "title": row[title_],
                 "stars": set()
             }
+            count += 1
+        rows["movies"] = count
 
-    # Load stars
-    with open(f"{directory}/stars.csv", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
+    # Load stars, skipping rows for unknown people or movies
+    with open(f"{directory}/stars.csv", encoding="utf-8", newline="") as f:
+        reader = csv.reader(f)
+        person_, movie_ = columns(next(reader), "person_id", "movie_id")
+        count = 0
         for row in reader:
-            try:
-                people[row["person_id"]]["movies"].add(row["movie_id"])
-                movies[row["movie_id"]]["stars"].add(row["person_id"])
-            except KeyError:
-                pass
+            count += 1
+            person = people.get(row[person_])
+            movie = movies.get(row[movie_])
+            if person is None or movie is None:
+                continue
+            person["movies"].add(sys.intern(row[movie_]))
+            movie["stars"].add(sys.intern(row[person_]))
+        rows["stars"] = count
+
+    return rows
+
+
+def columns(header, *fields):
+    """
+    Returns the position of each of `fields` in a CSV header row.
+    """
+    return [header.index(field) for field in fields]
+
+
+def peak_rss():
+    """
+    Returns the peak resident set size of this process in bytes.
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
 
 
 def main():
@@ -86,72 +256,181 @@ def main():
             print(f"{i + 1}: {person1} and {person2} starred in {movie}")
 
 
-def shortest_path(source, target):
+def shortest_path(source, target, bidirectional=False):
     """
     Returns the shortest list of (movie_id, person_id) pairs
     that connect the source to the target.
 
     If no possible path, returns None.
+
+    If `bidirectional` is true, search from both ends at once
+    (see `bidirectional_shortest_path`). Otherwise use the landmark
+    index or compact graph when `load_data` built one.
     """
+    # People in different components are never connected
+    if components and not connected(source, target):
+        return None
 
-    ppl_visited = []
-    ppl_visited.append(source)
+    if bidirectional:
+        return bidirectional_shortest_path(source, target)
+    if landmark_index is not None:
+        return landmark_index.shortest_path(source, target)
+    if graph is not None:
+        return graph.shortest_path(source, target)
 
-    queue = QueueFrontier()
-    queue.add((0, source))
-    
-    parent = dict()
-    parent[(0, source)] = None
+    if source == target:
+        return []
 
-    reversed_path = []
+    # People who are, or have been, in the frontier
+    explored = {source}
 
-    while not queue.empty():
-        current_ppl = queue.remove()
-        current_id = current_ppl[1]
-        if current_id == target:
-            reversed_path.append(current_ppl)
-            break
+    frontier = QueueFrontier()
+    frontier.add(Node(state=source, parent=None, action=None))
 
-        for ppl in neighbors_for_person(current_id):
-            if ppl[1] not in ppl_visited:
-                queue.add(ppl)
-                parent[ppl] = current_ppl
-                ppl_visited.append(ppl[1])
-    
-    if len(reversed_path) == 0:
-        return None
+    while not frontier.empty():
+        node = frontier.remove()
+
+        for movie_id, person_id in neighbors_for_person(node.state):
+            if person_id in explored:
+                continue
+            child = Node(state=person_id, parent=node, action=movie_id)
+            if person_id == target:
+                path = []
+                while child.parent is not None:
+                    path.append((child.action, child.state))
+                    child = child.parent
+                path.reverse()
+                return path
+            explored.add(person_id)
+            frontier.add(child)
+
+    return None
+
+
+def bidirectional_shortest_path(source, target):
+    """
+    Returns the shortest list of (movie_id, person_id) pairs
+    that connect the source to the target, using a breadth-first
+    search from both ends that always expands the smaller frontier.
+
+    If no possible path, returns None.
+    """
+    if source == target:
+        return []
+
+    # Maps person_id to (movie_id, person_id) of the step towards each end
+    forward = {source: None}
+    backward = {target: None}
+    forward_frontier = [source]
+    backward_frontier = [target]
+
+    while forward_frontier and backward_frontier:
+
+        # Expand one whole level of the smaller frontier
+        if len(forward_frontier) <= len(backward_frontier):
+            frontier, visited, other = forward_frontier, forward, backward
+        else:
+            frontier, visited, other = backward_frontier, backward, forward
+
+        next_frontier = []
+        meeting = None
+        for person_id in frontier:
+            for movie_id, neighbor in neighbors_for_person(person_id):
+                if neighbor in visited:
+                    continue
+                visited[neighbor] = (movie_id, person_id)
+                next_frontier.append(neighbor)
+                if meeting is None and neighbor in other:
+                    meeting = neighbor
+            if meeting is not None:
+                break
+
+        if meeting is not None:
+            return _join_paths(forward, backward, meeting)
+
+        if visited is forward:
+            forward_frontier = next_frontier
+        else:
+            backward_frontier = next_frontier
+
+    return None
 
-    while parent[current_ppl][1] is not source:
-        current_ppl = parent[current_ppl]
-        reversed_path.append(current_ppl)
-    
-    reversed_path.reverse()
-    return reversed_path
 
-def person_id_for_name(name):
+def _join_paths(forward, backward, meeting):
+    """
+    Builds the (movie_id, person_id) path through `meeting`
+    from the parent maps of a bidirectional search.
+    """
+    path = []
+    person_id = meeting
+    while forward[person_id] is not None:
+        movie_id, previous = forward[person_id]
+        path.append((movie_id, person_id))
+        person_id = previous
+    path.reverse()
+
+    person_id = meeting
+    while backward[person_id] is not None:
+        movie_id, following = backward[person_id]
+        path.append((movie_id, following))
+        person_id = following
+    return path
+
+
+def person_id_for_name(name, interactive=True):
     """
     Returns the IMDB id for a person's name,
     resolving ambiguities as needed.
+
+    If `interactive` is false, never prompt: return the best known
+    person with that exact name, or None.
     """
-    person_ids = list(names.get(name.lower(), set()))
-    if len(person_ids) == 0:
-        return None
+    person_ids = lookup.rank(names.get(name.lower(), set()), people)
+    if not interactive:
+        return person_ids[0] if person_ids else None
+
+    if len(person_ids) == 1:
+        return person_ids[0]
     elif len(person_ids) > 1:
         print(f"Which '{name}'?")
-        for person_id in person_ids:
-            person = people[person_id]
-            name = person["name"]
-            birth = person["birth"]
-            print(f"ID: {person_id}, Name: {name}, Birth: {birth}")
-        try:
-            person_id = input("Intended Person ID: ")
-            if person_id in person_ids:
-                return person_id
-        except ValueError:
-            pass
-        return None
     else:
-        return person_ids[0]
+        person_ids = search_names(name)
+        if len(person_ids) == 0:
+            return None
+        print(f"No exact match for '{name}'. Did you mean:")
+
+    for person_id in person_ids:
+        person = people[person_id]
+        print(f"ID: {person_id}, Name: {person['name']}, "
+              f"Birth: {person['birth']}")
+    try:
+        person_id = input("Intended Person ID: ")
+        if person_id in person_ids:
+            return person_id
+    except ValueError:
+        pass
+    return None
+
+
+def resolve_person(query):
+    """
+    Returns the person_id for a person_id or name without prompting,
+    taking the best known person for ambiguous names, or None.
+    """
+    if query in people:
+        return query
+    return person_id_for_name(query, interactive=False)
+
+
+def search_names(query, limit=10):
+    """
+    Returns up to `limit` candidate person_ids for a name or partial,
+    possibly misspelled name, best first.
+    """
+    global name_index
+    if name_index is None:
+        name_index = lookup.NameIndex(names, people)
+    return name_index.search(query, limit)
 
 
 def neighbors_for_person(person_id):
@@ -0,0 +1,137 @@
+from array import array
+
+
+class CompactGraph():
+    """
+    The bipartite people/movies star relation with people and movies
+    mapped to dense ints and both directions stored in CSR form: the
+    movies of person `i` are `person_movies[person_offsets[i]:person_offsets[i + 1]]`,
+    and likewise the people of movie `j` in `movie_people`.
+    """
+
+    def __init__(self, person_ids, movie_ids,
+                 person_offsets, person_movies,
+                 movie_offsets, movie_people):
+        self.person_ids = person_ids
+        self.movie_ids = movie_ids
+        self.person_index = {
+            person_id: i for i, person_id in enumerate(person_ids)
+        }
+        self.person_offsets = person_offsets
+        self.person_movies = person_movies
+        self.movie_offsets = movie_offsets
+        self.movie_people = movie_people
+
+    @classmethod
+    def from_data(cls, people, movies):
+        """
+        Build a graph from the `people` and `movies` dictionaries
+        filled in by `load_data`.
+        """
+        person_ids = list(people)
+        movie_ids = list(movies)
+        person_index = {person_id: i for i, person_id in enumerate(person_ids)}
+        movie_index = {movie_id: i for i, movie_id in enumerate(movie_ids)}
+
+        person_offsets = array("l", [0])
+        person_movies = array("l")
+        for person_id in person_ids:
+            person_movies.extend(
+                movie_index[movie_id] for movie_id in people[person_id]["movies"]
+            )
+            person_offsets.append(len(person_movies))
+
+        movie_offsets = array("l", [0])
+        movie_people = array("l")
+        for movie_id in movie_ids:
+            movie_people.extend(
+                person_index[person_id] for person_id in movies[movie_id]["stars"]
+            )
+            movie_offsets.append(len(movie_people))
+
+        return cls(person_ids, movie_ids,
+                   person_offsets, person_movies,
+                   movie_offsets, movie_people)
+
+    def nbytes(self):
+        """
+        Return the size of the CSR buffers in bytes.
+        """
+        return sum(
+            len(buffer) * buffer.itemsize
+            for buffer in (self.person_offsets, self.person_movies,
+                           self.movie_offsets, self.movie_people)
+        )
+
+    def shortest_path(self, source, target):
+        """
+        Returns the shortest list of (movie_id, person_id) pairs
+        that connect the source to the target, searching breadth-first
+        over the int graph.
+
+        If no possible path, returns None.
+        """
+        return self.shortest_paths(source, [target])[target]
+
+    def shortest_paths(self, source, targets):
+        """
+        Returns a dictionary mapping each of `targets` to its shortest
+        list of (movie_id, person_id) pairs from the source, or None if
+        not connected, using one breadth-first search that stops once
+        every target has been reached.
+        """
+        s = self.person_index[source]
+        remaining = {self.person_index[target] for target in targets}
+        remaining.discard(s)
+
+        person_offsets = self.person_offsets
+        person_movies = self.person_movies
+        movie_offsets = self.movie_offsets
+        movie_people = self.movie_people
+
+        # Person and movie each person was first reached through, or -1
+        parent = array("l", [-1]) * len(self.person_ids)
+        via = array("l", [-1]) * len(self.person_ids)
+        parent[s] = s
+
+        # Movies already expanded can not reach anyone new
+        seen_movie = bytearray(len(self.movie_ids))
+
+        queue = array("l", [s])
+        head = 0
+        while remaining and head < len(queue):
+            person = queue[head]
+            head += 1
+            for k in range(person_offsets[person], person_offsets[person + 1]):
+                movie = person_movies[k]
+                if seen_movie[movie]:
+                    continue
+                seen_movie[movie] = 1
+                for m in range(movie_offsets[movie], movie_offsets[movie + 1]):
+                    neighbor = movie_people[m]
+                    if parent[neighbor] != -1:
+                        continue
+                    parent[neighbor] = person
+                    via[neighbor] = movie
+                    queue.append(neighbor)
+                    remaining.discard(neighbor)
+
+        return {
+            target: self.trace_path(parent, via, s, self.person_index[target])
+            for target in targets
+        }
+
+    def trace_path(self, parent, via, s, t):
+        """
+        Follow `parent` back from `t` to `s` and return the path
+        as (movie_id, person_id) pairs, or None if `t` was not reached.
+        """
+        if parent[t] == -1:
+            return None
+        path = []
+        person = t
+        while person != s:
+            path.append((self.movie_ids[via[person]], self.person_ids[person]))
+            person = parent[person]
+        path.reverse()
+        return path
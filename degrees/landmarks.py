@@ -0,0 +1,215 @@
+import heapq
+import os
+import struct
+from array import array
+
+import snapshot
+
+# Bump whenever the file layout changes
+VERSION = 1
+
+MAGIC = b"LANDMARK"
+FILENAME = "degrees.landmarks"
+
+# Distance stored for people a landmark can not reach
+UNREACHABLE = 0xFFFF
+
+
+class LandmarkIndex():
+    """
+    Degrees of separation from each of a few high-degree landmark
+    people to everyone, one unsigned 16-bit array per landmark.
+
+    By the triangle inequality, for any landmark L
+        |d(L, s) - d(L, t)| <= d(s, t) <= d(L, s) + d(L, t)
+    which gives distance bounds without searching.
+    """
+
+    def __init__(self, graph, landmarks, distances):
+        self.graph = graph
+        self.landmarks = landmarks
+        self.distances = distances
+
+    @classmethod
+    def build(cls, graph, k=16):
+        """
+        Pick the `k` people with the most co-stars as landmarks
+        and find the distance from each of them to everyone.
+        """
+        n = len(graph.person_ids)
+        costars = [
+            sum(
+                graph.movie_offsets[movie + 1] - graph.movie_offsets[movie]
+                for movie in graph.person_movies[
+                    graph.person_offsets[person]:graph.person_offsets[person + 1]
+                ]
+            )
+            for person in range(n)
+        ]
+        landmarks = heapq.nlargest(k, range(n), key=costars.__getitem__)
+        distances = [distances_from(graph, landmark) for landmark in landmarks]
+        return cls(graph, landmarks, distances)
+
+    def bounds(self, source, target):
+        """
+        Return (lower, upper) bounds on the degrees of separation
+        between two person ids. `upper` is None if no landmark reaches
+        both, and `lower` is None if they are certainly not connected.
+        """
+        s = self.graph.person_index[source]
+        t = self.graph.person_index[target]
+        if s == t:
+            return 0, 0
+        lower, upper = 1, None
+        for distances in self.distances:
+            ds, dt = distances[s], distances[t]
+            if ds == UNREACHABLE and dt == UNREACHABLE:
+                continue
+            if ds == UNREACHABLE or dt == UNREACHABLE:
+                return None, None
+            lower = max(lower, abs(ds - dt))
+            if upper is None or ds + dt < upper:
+                upper = ds + dt
+        return lower, upper
+
+    def shortest_path(self, source, target):
+        """
+        Returns the shortest list of (movie_id, person_id) pairs
+        that connect the source to the target, using an A* search
+        guided by the landmark lower bound.
+
+        If no possible path, returns None.
+        """
+        graph = self.graph
+        s = graph.person_index[source]
+        t = graph.person_index[target]
+        if s == t:
+            return []
+        if self.bounds(source, target)[0] is None:
+            return None
+
+        # Distances to the target from each landmark that reaches it
+        targets = [
+            (distances, distances[t]) for distances in self.distances
+            if distances[t] != UNREACHABLE
+        ]
+
+        def estimate(person):
+            h = 0
+            for distances, dt in targets:
+                h = max(h, abs(distances[person] - dt))
+            return h
+
+        parent = {s: s}
+        via = {}
+        cost = {s: 0}
+        frontier = [(estimate(s), 0, s)]
+        while frontier:
+            _, g, person = heapq.heappop(frontier)
+            if person == t:
+                return graph.trace_path(parent, via, s, t)
+            if g > cost[person]:
+                continue
+            for k in range(graph.person_offsets[person],
+                           graph.person_offsets[person + 1]):
+                movie = graph.person_movies[k]
+                for m in range(graph.movie_offsets[movie],
+                               graph.movie_offsets[movie + 1]):
+                    neighbor = graph.movie_people[m]
+                    if neighbor in cost and cost[neighbor] <= g + 1:
+                        continue
+                    cost[neighbor] = g + 1
+                    parent[neighbor] = person
+                    via[neighbor] = movie
+                    heapq.heappush(
+                        frontier, (g + 1 + estimate(neighbor), g + 1, neighbor)
+                    )
+
+        return None
+
+    def save(self, directory):
+        """
+        Write the index next to the dataset in `directory`,
+        keyed on the same CSV mtimes and sizes as the data snapshot.
+        """
+        header = {
+            "key": snapshot.snapshot_key(directory),
+            "people": len(self.graph.person_ids),
+            "landmarks": [self.graph.person_ids[i] for i in self.landmarks],
+        }
+
+        def write_body(f):
+            for distances in self.distances:
+                distances.tofile(f)
+
+        snapshot.write_file(os.path.join(directory, FILENAME), MAGIC, VERSION,
+                            header, write_body)
+
+    @classmethod
+    def load(cls, directory, graph):
+        """
+        Load the index saved in `directory` for `graph`, or return None
+        if there is none or it is out of date with the CSV files.
+        """
+        path = os.path.join(directory, FILENAME)
+        try:
+            with open(path, "rb") as f:
+                header = snapshot.read_header(f, MAGIC, VERSION)
+                if header is None:
+                    return None
+                if (header["key"] != snapshot.snapshot_key(directory)
+                        or header["people"] != len(graph.person_ids)):
+                    return None
+                distances = []
+                for _ in header["landmarks"]:
+                    column = array("H")
+                    column.fromfile(f, header["people"])
+                    distances.append(column)
+        except (OSError, EOFError, struct.error, ValueError, KeyError):
+            return None
+        landmarks = [graph.person_index[i] for i in header["landmarks"]]
+        return cls(graph, landmarks, distances)
+
+
+def distances_from(graph, source):
+    """
+    Return an array of the degrees of separation from person
+    index `source` to every person, found by breadth-first search.
+    """
+    distances = array("H", [UNREACHABLE]) * len(graph.person_ids)
+    distances[source] = 0
+    seen_movie = bytearray(len(graph.movie_ids))
+    queue = array("l", [source])
+    head = 0
+    while head < len(queue):
+        person = queue[head]
+        head += 1
+        d = distances[person] + 1
+        for k in range(graph.person_offsets[person],
+                       graph.person_offsets[person + 1]):
+            movie = graph.person_movies[k]
+            if seen_movie[movie]:
+                continue
+            seen_movie[movie] = 1
+            for m in range(graph.movie_offsets[movie],
+                           graph.movie_offsets[movie + 1]):
+                neighbor = graph.movie_people[m]
+                if distances[neighbor] == UNREACHABLE:
+                    distances[neighbor] = d
+                    queue.append(neighbor)
+    return distances
+
+
+def load_index(directory, graph, k=16):
+    """
+    Return the landmark index for the dataset in `directory`,
+    building and saving it if it is missing or out of date.
+    """
+    index = LandmarkIndex.load(directory, graph)
+    if index is None:
+        index = LandmarkIndex.build(graph, k)
+        try:
+            index.save(directory)
+        except OSError:
+            pass
+    return index
@@ -0,0 +1,155 @@
+import heapq
+from array import array
+from collections import Counter
+from bisect import bisect_left
+from difflib import SequenceMatcher
+
+# How many of a query's rarest trigrams to draw fuzzy candidates from,
+# and how many posting list entries to count at most: rarer lists are
+# taken first, stopping before one would pass the limit
+RARE_TRIGRAMS = 6
+SCAN_LIMIT = 4096
+
+# How many of the names sharing the most rare trigrams to score by
+# trigram overlap
+CANDIDATES = 20
+
+
+class NameIndex():
+    """
+    Prefix and fuzzy search over the lowercase names of `names`.
+
+    Prefix search bisects a sorted array of names. Fuzzy search counts
+    hits over the rarest trigram posting lists of the query, so it only
+    touches a small slice of the names, then ranks the names with the
+    most hits by trigram overlap, and the best of those by edit
+    similarity too.
+    """
+
+    def __init__(self, names, people, sorted_names=None, postings=None):
+        self.names = names
+        self.people = people
+
+        # `sorted_names` and `postings` may be passed in as loaded from
+        # a snapshot, and are otherwise built here
+        if sorted_names is None:
+            sorted_names = sorted(names)
+        self.sorted_names = sorted_names
+        if postings is not None:
+            self.postings = postings
+            return
+
+        # Maps each trigram to the indices in `sorted_names` containing it
+        self.postings = {}
+        for i, name in enumerate(self.sorted_names):
+            for trigram in trigrams(name):
+                posting = self.postings.get(trigram)
+                if posting is None:
+                    posting = self.postings[trigram] = array("l")
+                posting.append(i)
+
+    def person_ids(self, name):
+        """
+        Return the person_ids with exactly this name, best known first.
+        """
+        return rank(self.names.get(name.lower(), ()), self.people)
+
+    def prefix(self, query, limit=10):
+        """
+        Return up to `limit` names starting with `query`, in order.
+        """
+        query = query.lower()
+        matches = []
+        i = bisect_left(self.sorted_names, query)
+        while (i < len(self.sorted_names) and len(matches) < limit
+               and self.sorted_names[i].startswith(query)):
+            matches.append(self.sorted_names[i])
+            i += 1
+        return matches
+
+    def fuzzy(self, query, limit=10):
+        """
+        Return up to `limit` (score, name) pairs for the names most
+        similar to `query`, best first, with scores between 0 and 1.
+
+        Candidates are ranked by trigram overlap, which is cheap, and
+        only the best `limit` of them by edit similarity as well.
+        """
+        query = query.lower()
+        query_trigrams = trigrams(query)
+        postings = sorted(
+            (self.postings[trigram] for trigram in query_trigrams
+             if trigram in self.postings),
+            key=len
+        )
+        hits = Counter()
+        scanned = 0
+        for posting in postings[:RARE_TRIGRAMS]:
+            scanned += len(posting)
+            if hits and scanned > SCAN_LIMIT:
+                break
+            hits.update(posting)
+
+        overlaps = []
+        for i, _ in hits.most_common(CANDIDATES):
+            name = self.sorted_names[i]
+            name_trigrams = trigrams(name)
+            overlaps.append((
+                len(query_trigrams & name_trigrams)
+                / len(query_trigrams | name_trigrams),
+                name
+            ))
+
+        # One matcher against the query, so its index of the query
+        # is built once
+        matcher = SequenceMatcher(None)
+        matcher.set_seq2(query)
+        scored = []
+        for overlap, name in heapq.nlargest(limit, overlaps):
+            matcher.set_seq1(name)
+            scored.append(((overlap + matcher.ratio()) / 2, name))
+        return sorted(scored, reverse=True)
+
+    def search(self, query, limit=10):
+        """
+        Return up to `limit` candidate person_ids for `query`, ranked:
+        exact name matches, then names starting with the query. Only
+        if there are neither, fall back to the closest fuzzy matches,
+        which cost far more to find.
+        """
+        ranked = []
+        seen = set()
+
+        def extend(name):
+            for person_id in self.person_ids(name):
+                if person_id not in seen:
+                    seen.add(person_id)
+                    ranked.append(person_id)
+
+        extend(query)
+        for name in self.prefix(query, limit):
+            extend(name)
+        if not ranked:
+            for _, name in self.fuzzy(query, limit):
+                extend(name)
+        return ranked[:limit]
+
+
+def rank(person_ids, people):
+    """
+    Order person_ids by how many movies they starred in,
+    most first, breaking ties by id.
+    """
+    return sorted(
+        person_ids,
+        key=lambda person_id: (-len(people[person_id]["movies"]), person_id)
+    )
+
+
+def trigrams(name):
+    """
+    Return the set of character trigrams of a name, padded so that
+    the start and end of the name count too.
+    """
+    padded = f"  {name} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
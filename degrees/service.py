@@ -0,0 +1,195 @@
+import functools
+import sys
+import threading
+import time
+from collections import deque
+
+from flask import Flask, current_app, g, jsonify, request
+
+import degrees
+
+# How many recent request latencies to keep per endpoint
+LATENCY_WINDOW = 1000
+
+
+class Metrics():
+    """
+    Request counts and recent latencies per endpoint, safe to
+    update from concurrent request threads.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = {}
+        self.latencies = {}
+
+    def record(self, endpoint, seconds):
+        with self.lock:
+            self.counts[endpoint] = self.counts.get(endpoint, 0) + 1
+            if endpoint not in self.latencies:
+                self.latencies[endpoint] = deque(maxlen=LATENCY_WINDOW)
+            self.latencies[endpoint].append(seconds)
+
+    def summary(self):
+        """
+        Return the count and latency percentiles (in milliseconds)
+        of the recent requests to each endpoint.
+        """
+        with self.lock:
+            latencies = {
+                endpoint: sorted(window)
+                for endpoint, window in self.latencies.items()
+            }
+            counts = dict(self.counts)
+        return {
+            endpoint: {
+                "count": counts[endpoint],
+                "mean_ms": sum(window) / len(window) * 1000,
+                "p50_ms": percentile(window, 0.50) * 1000,
+                "p95_ms": percentile(window, 0.95) * 1000,
+                "p99_ms": percentile(window, 0.99) * 1000,
+                "max_ms": window[-1] * 1000,
+            }
+            for endpoint, window in latencies.items()
+        }
+
+
+def percentile(values, fraction):
+    """
+    Return the value at `fraction` of the way through sorted `values`.
+    """
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def create_app(directory=None, cache_size=4096):
+    """
+    Create the query service, loading the dataset in `directory`
+    if given. Paths for the last `cache_size` distinct queries
+    are kept in an LRU cache.
+    """
+    if directory is not None:
+        degrees.load_data(directory, compact=True)
+
+    app = Flask(__name__)
+    app.config["METRICS"] = Metrics()
+    app.config["SHORTEST_PATH"] = functools.lru_cache(maxsize=cache_size)(
+        degrees.shortest_path
+    )
+
+    @app.before_request
+    def start_timer():
+        g.start = time.perf_counter()
+
+    @app.after_request
+    def record_latency(response):
+        if request.endpoint is not None:
+            current_app.config["METRICS"].record(
+                request.endpoint, time.perf_counter() - g.start
+            )
+        return response
+
+    app.add_url_rule("/path", view_func=path)
+    app.add_url_rule("/neighbors", view_func=neighbors)
+    app.add_url_rule("/metrics", view_func=metrics)
+    return app
+
+
+def path():
+    """
+    Return the shortest path between the `source` and `target`
+    people, given as person_ids or names.
+    """
+    source_id, error = person_argument("source")
+    if error:
+        return error
+    target_id, error = person_argument("target")
+    if error:
+        return error
+
+    steps = current_app.config["SHORTEST_PATH"](source_id, target_id)
+    return jsonify({
+        "source": person_json(source_id),
+        "target": person_json(target_id),
+        "degrees": None if steps is None else len(steps),
+        "path": None if steps is None else [
+            step_json(movie_id, person_id) for movie_id, person_id in steps
+        ],
+    })
+
+
+def neighbors():
+    """
+    Return the movies and co-stars of the `person`.
+    """
+    person_id, error = person_argument("person")
+    if error:
+        return error
+    return jsonify({
+        "person": person_json(person_id),
+        "neighbors": [
+            step_json(movie_id, neighbor)
+            for movie_id, neighbor in sorted(
+                degrees.neighbors_for_person(person_id)
+            )
+            if neighbor != person_id
+        ],
+    })
+
+
+def metrics():
+    """
+    Return per-endpoint latency metrics and path cache statistics.
+    """
+    cache = current_app.config["SHORTEST_PATH"].cache_info()
+    return jsonify({
+        "endpoints": current_app.config["METRICS"].summary(),
+        "path_cache": {
+            "hits": cache.hits,
+            "misses": cache.misses,
+            "size": cache.currsize,
+            "max_size": cache.maxsize,
+        },
+    })
+
+
+def person_argument(name):
+    """
+    Resolve the query argument `name` to a person_id.
+
+    Return (person_id, None), or (None, error response).
+    """
+    query = request.args.get(name, "").strip()
+    if not query:
+        return None, (jsonify({"error": f"Missing '{name}'."}), 400)
+    person_id = degrees.resolve_person(query)
+    if person_id is None:
+        return None, (jsonify({"error": f"Person '{query}' not found."}), 404)
+    return person_id, None
+
+
+def person_json(person_id):
+    return {"person_id": person_id, "name": degrees.people[person_id]["name"]}
+
+
+def step_json(movie_id, person_id):
+    return {
+        "movie_id": movie_id,
+        "title": degrees.movies[movie_id]["title"],
+        **person_json(person_id),
+    }
+
+
+def main():
+    if len(sys.argv) > 3:
+        sys.exit("Usage: python service.py [directory] [port]")
+    directory = sys.argv[1] if len(sys.argv) >= 2 else "large"
+    port = int(sys.argv[2]) if len(sys.argv) == 3 else 5000
+
+    print("Loading data...")
+    app = create_app(directory)
+    print("Data loaded.")
+    app.run(port=port, threaded=True)
+
+
+if __name__ == "__main__":
+    main()
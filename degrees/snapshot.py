@@ -0,0 +1,230 @@
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+from graph import CompactGraph
+from lookup import NameIndex
+
+# Bump whenever the layout below changes
+VERSION = 4
+
+MAGIC = b"DEGREES\0"
+FILENAME = "degrees.snapshot"
+CSV_FILES = ("people.csv", "movies.csv", "stars.csv")
+
+# Magic, version and header length, then the JSON header
+PREFIX = struct.Struct("<8sII")
+
+# String columns, each stored as UTF-8 text plus an array of the
+# character offsets where each string starts
+STRING_FIELDS = (
+    "person_ids", "person_names", "births", "movie_ids", "titles",
+    "sorted_names", "trigrams",
+)
+
+CSR_FIELDS = ("person_offsets", "person_movies", "movie_offsets", "movie_people")
+
+
+def snapshot_key(directory):
+    """
+    Return the mtimes and sizes of the CSV files in `directory`,
+    which a snapshot must match to be used.
+    """
+    key = []
+    for filename in CSV_FILES:
+        stat = os.stat(os.path.join(directory, filename))
+        key.append([filename, stat.st_mtime_ns, stat.st_size])
+    return key
+
+
+def save(directory, names, people, movies, graph, name_index):
+    """
+    Write a snapshot of the loaded data to `directory`.
+
+    Layout: prefix, JSON header, the text of each string column,
+    then the string offsets, CSR buffers and the name index's
+    trigram postings (offsets, then the concatenated lists) as raw
+    8-byte ints aligned to 8 bytes so they can be cast straight out
+    of a mmap. Nothing in it is executable, so loading an untrusted
+    snapshot can at worst fail. `names` is rebuilt from the people's
+    names.
+    """
+    trigrams = list(name_index.postings)
+    columns = [
+        graph.person_ids,
+        [people[person_id]["name"] for person_id in graph.person_ids],
+        [people[person_id]["birth"] for person_id in graph.person_ids],
+        graph.movie_ids,
+        [movies[movie_id]["title"] for movie_id in graph.movie_ids],
+        name_index.sorted_names,
+        trigrams,
+    ]
+    texts = [("".join(column)).encode("utf-8") for column in columns]
+    buffers = [string_offsets(column) for column in columns]
+    buffers += [array("q", getattr(graph, field)) for field in CSR_FIELDS]
+    postings = [name_index.postings[trigram] for trigram in trigrams]
+    buffers.append(string_offsets(postings))
+    buffers.append(array("q"))
+    for posting in postings:
+        buffers[-1].fromlist(list(posting))
+    header = {
+        "key": snapshot_key(directory),
+        "texts": [len(text) for text in texts],
+        "buffers": [len(buffer) for buffer in buffers],
+    }
+
+    def write_body(f):
+        for text in texts:
+            f.write(text)
+        for buffer in buffers:
+            f.write(bytes(-f.tell() % 8))
+            buffer.tofile(f)
+
+    write_file(os.path.join(directory, FILENAME), MAGIC, VERSION, header,
+               write_body)
+
+
+def load(directory):
+    """
+    Load the snapshot in `directory`, memory-mapping its CSR buffers.
+
+    Return (names, people, movies, graph, name_index), or None if
+    there is no snapshot or it is from another version, older CSV
+    files, or is damaged.
+    """
+    path = os.path.join(directory, FILENAME)
+    try:
+        with open(path, "rb") as f:
+            header = read_header(f, MAGIC, VERSION)
+            offset = f.tell()
+            contents = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError, struct.error):
+        return None
+
+    try:
+        if header is None or header["key"] != snapshot_key(directory):
+            return None
+        texts = []
+        for size in header["texts"]:
+            texts.append(str(contents[offset:offset + size], "utf-8"))
+            offset += size
+
+        view = memoryview(contents)
+        buffers = []
+        for size in header["buffers"]:
+            offset += -offset % 8
+            if offset + size * 8 > len(contents):
+                return None
+            buffers.append(view[offset:offset + size * 8].cast("q"))
+            offset += size * 8
+
+        (person_ids, person_names, births, movie_ids, titles,
+         sorted_names, trigrams) = [
+            split(text, offsets)
+            for text, offsets in zip(texts, buffers[:len(STRING_FIELDS)])
+        ]
+        csr = buffers[len(STRING_FIELDS):len(STRING_FIELDS) + len(CSR_FIELDS)]
+        posting_offsets, postings = (
+            buffers[len(STRING_FIELDS) + len(CSR_FIELDS):]
+        )
+        posting_offsets = posting_offsets.tolist()
+        if len(posting_offsets) != len(trigrams) + 1:
+            return None
+    except (struct.error, ValueError, KeyError, TypeError,
+            UnicodeDecodeError):
+        return None
+
+    person_ids = [sys.intern(person_id) for person_id in person_ids]
+    movie_ids = [sys.intern(movie_id) for movie_id in movie_ids]
+    graph = CompactGraph(person_ids, movie_ids, *csr)
+
+    # Plain lists are much faster to slice than the mapped buffers
+    person_offsets = graph.person_offsets.tolist()
+    person_movies = graph.person_movies.tolist()
+    movie_offsets = graph.movie_offsets.tolist()
+    movie_people = graph.movie_people.tolist()
+
+    names = {}
+    people = {}
+    for person_id, name, birth, start, end in zip(
+            person_ids, person_names, births,
+            person_offsets, person_offsets[1:]):
+        people[person_id] = {
+            "name": name,
+            "birth": birth,
+            "movies": set(map(movie_ids.__getitem__, person_movies[start:end]))
+        }
+        names.setdefault(name.lower(), set()).add(person_id)
+
+    movies = {}
+    for movie_id, title, start, end in zip(
+            movie_ids, titles, movie_offsets, movie_offsets[1:]):
+        movies[movie_id] = {
+            "title": title,
+            "stars": set(map(person_ids.__getitem__, movie_people[start:end]))
+        }
+
+    name_index = NameIndex(names, people, sorted_names, {
+        trigram: postings[start:end]
+        for trigram, start, end in zip(
+            trigrams, posting_offsets, posting_offsets[1:])
+    })
+    return names, people, movies, graph, name_index
+
+
+def write_file(path, magic, version, header, write_body):
+    """
+    Write a cache file at `path`: the prefix with `magic`, `version`
+    and the header length, the `header` dictionary as JSON, then
+    whatever `write_body` writes to the open file.
+
+    The file is written under a temporary name and renamed into
+    place, so readers never see a partial file.
+    """
+    header = json.dumps(header).encode()
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "wb") as f:
+        f.write(PREFIX.pack(magic, version, len(header)))
+        f.write(header)
+        write_body(f)
+    os.replace(temporary, path)
+
+
+def read_header(f, magic, version):
+    """
+    Read the prefix and JSON header of a file written by `write_file`,
+    leaving `f` at the start of the body.
+
+    Return the header, or None if the file has another magic or
+    version. Raise `struct.error` or `ValueError` if it is damaged.
+    """
+    found_magic, found_version, length = PREFIX.unpack(f.read(PREFIX.size))
+    if found_magic != magic or found_version != version:
+        return None
+    return json.loads(f.read(length))
+
+
+def string_offsets(strings):
+    """
+    Return the offsets of `strings` (or any sequences) joined
+    together: string `i` runs from offset `i` to offset `i + 1`.
+    """
+    offsets = array("q", [0])
+    total = 0
+    for string in strings:
+        total += len(string)
+        offsets.append(total)
+    return offsets
+
+
+def split(text, offsets):
+    """
+    Split joined `text` back into strings at `offsets`.
+    """
+    offsets = offsets.tolist()
+    if not offsets or offsets[-1] != len(text):
+        raise ValueError("string offsets do not match text")
+    return [text[start:end] for start, end in zip(offsets, offsets[1:])]
@@ -0,0 +1,33 @@
+import sys
+
+import degrees
+
+
+def main():
+    if len(sys.argv) > 3:
+        sys.exit("Usage: python stats.py [directory] [top]")
+    directory = sys.argv[1] if len(sys.argv) >= 2 else "large"
+    top = int(sys.argv[2]) if len(sys.argv) == 3 else 10
+
+    print("Loading data...")
+    degrees.load_data(directory, cache=False)
+    print("Data loaded.")
+
+    load = degrees.load_stats
+    print(f"Loaded from {load['source']} in {load['seconds']:.2f}s")
+    if load["rows"]:
+        print(f"Rows: {load['rows']} ({load['rows_per_second']:.0f} rows/sec)")
+    print(f"Peak RSS: {load['peak_rss'] / 2 ** 20:.1f} MiB")
+    sizes = sorted(degrees.component_sizes.values(), reverse=True)
+    print(f"People: {len(degrees.people)}")
+    print(f"Movies: {len(degrees.movies)}")
+    print(f"Components: {len(sizes)}")
+    print(f"Isolated people: {sizes.count(1)}")
+    print("Largest components:")
+    for i, size in enumerate(sizes[:top]):
+        share = size / len(degrees.people)
+        print(f"  {i + 1}: {size} people ({share:.1%})")
+
+
+if __name__ == "__main__":
+    main()
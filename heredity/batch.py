@@ -0,0 +1,284 @@
+import csv
+import functools
+import json
+import multiprocessing
+import os
+import sys
+
+import heredity
+import inference
+
+# Families sent to a worker process at a time
+CHUNK_SIZE = 16
+
+# Compiled families kept by each worker process
+CACHE_SIZE = 4096
+
+FORMATS = ("json", "csv")
+
+
+def main():
+    if not 2 <= len(sys.argv) <= 4:
+        sys.exit("Usage: python batch.py (directory | families.jsonl | -) "
+                 "[workers] [json | csv]")
+    source = sys.argv[1]
+    workers = int(sys.argv[2]) if len(sys.argv) >= 3 else os.cpu_count()
+    output = sys.argv[3] if len(sys.argv) == 4 else "json"
+    if output not in FORMATS:
+        sys.exit(f"Format must be one of: {', '.join(FORMATS)}")
+
+    if source == "-":
+        families = read_families(sys.stdin)
+        results = analyze_families(families, workers)
+        write_results(results, output)
+    elif os.path.isdir(source):
+        results = analyze_families(read_directory(source), workers)
+        write_results(results, output)
+    else:
+        with open(source, encoding="utf-8") as f:
+            results = analyze_families(read_families(f), workers)
+            write_results(results, output)
+
+
+def read_directory(directory):
+    """
+    Yield a (family, people, error) triple for each CSV file in
+    `directory`, named after the file, with people as
+    `heredity.load_data` returns and error None, or people None and
+    an error message if the file cannot be read.
+    """
+    for filename in sorted(os.listdir(directory)):
+        if filename.endswith(".csv"):
+            name = os.path.splitext(filename)[0]
+            try:
+                people = heredity.load_data(os.path.join(directory, filename))
+            except KeyError as error:
+                yield name, None, f"{filename}: missing column {error}"
+            except (OSError, ValueError, csv.Error) as error:
+                yield name, None, f"{filename}: {error}"
+            else:
+                yield name, people, None
+
+
+def read_families(f):
+    """
+    Yield a (family, people, error) triple for each JSON line of `f`,
+    an object with a "family" name and a list of "people", each with
+    a "name", "mother", "father" and "trait" (true, false, 1, 0 or
+    null). A family without a name is named after its line number.
+
+    A line that cannot be read gives people None and an error message
+    instead. Traits are passed on as given and checked by
+    `check_family`, so a bad one also fails only its own family.
+    """
+    for number, line in enumerate(f, 1):
+        if not line.strip():
+            continue
+        name = str(number)
+        try:
+            family = json.loads(line)
+            if not isinstance(family, dict):
+                raise ValueError("not a JSON object")
+            name = family.get("family", name)
+            people = parse_people(family)
+        except ValueError as error:
+            yield name, None, f"line {number}: {error}"
+        else:
+            yield name, people, None
+
+
+def parse_people(family):
+    """
+    Return the people of a family read from JSON as a dictionary
+    like `heredity.load_data` returns, raising ValueError if the
+    family has no list of people, or someone has no name or a name
+    or parent that is not a string.
+    """
+    if not isinstance(family.get("people"), list):
+        raise ValueError('"people" must be a list')
+    people = {}
+    for person in family["people"]:
+        if not isinstance(person, dict) or "name" not in person:
+            raise ValueError(f"person without a name: {person!r}")
+        names = (person["name"], person.get("mother"), person.get("father"))
+        if not all(name is None or isinstance(name, str) for name in names):
+            raise ValueError(f"names must be strings: {person!r}")
+        people[person["name"]] = {
+            "name": person["name"],
+            "mother": person.get("mother") or None,
+            "father": person.get("father") or None,
+            "trait": person.get("trait")
+        }
+    return people
+
+
+def analyze_families(families, workers):
+    """
+    Yield a (family, probabilities, error) triple for each family,
+    computing the gene and trait distributions in a pool of `workers`
+    processes. Results are yielded as each family finishes, not in
+    input order.
+    """
+    if workers <= 1:
+        yield from map(analyze_family, families)
+        return
+
+    context = multiprocessing.get_context("fork")
+    with context.Pool(workers) as pool:
+        yield from pool.imap_unordered(analyze_family, families, CHUNK_SIZE)
+
+
+def analyze_family(family):
+    """
+    Return a family's name, each person's gene and trait
+    distributions and None, given a (family, people, error) triple
+    as the readers yield it, reusing the result for any family of
+    the same shape and known traits listed in the same order.
+
+    If the family could not be read, is invalid or is too entangled
+    for exact inference, return its name, None and the error message
+    instead, so one bad family does not stop the batch.
+    """
+    name, people, error = family
+    if error is not None:
+        return name, None, error
+    try:
+        people = check_family(people)
+        order, key = shape(people)
+        distributions = compiled(key)
+    except ValueError as error:
+        return name, None, str(error)
+    return name, {
+        person: distributions[i] for i, person in enumerate(order)
+    }, None
+
+
+def check_family(people):
+    """
+    Return a family's people with each trait as True, False or None,
+    raising ValueError if a trait is not true, false, 1, 0 or null,
+    if someone has only one parent listed or a parent not in the
+    family, or if someone is their own ancestor.
+    """
+    checked = {}
+    for person, data in people.items():
+        trait = data["trait"]
+        known = type(trait) in (bool, int) and trait in (0, 1)
+        if not (trait is None or known):
+            raise ValueError(f"{person}: trait must be true, false, 1, 0 "
+                             f"or null, not {trait!r}")
+        parents = (data["mother"], data["father"])
+        if (parents[0] is None) != (parents[1] is None):
+            raise ValueError(f"{person}: needs both parents or neither")
+        for parent in parents:
+            if parent is not None and parent not in people:
+                raise ValueError(f"{person}: parent {parent} not in family")
+        checked[person] = {
+            **data, "trait": None if trait is None else bool(trait)
+        }
+
+    # Follow parents depth first, with everyone on the current path
+    # marked as visiting
+    state = {}
+
+    def visit(person):
+        if state.get(person) == "done":
+            return
+        if state.get(person) == "visiting":
+            raise ValueError(f"{person} is their own ancestor")
+        state[person] = "visiting"
+        for parent in (people[person]["mother"], people[person]["father"]):
+            if parent is not None:
+                visit(parent)
+        state[person] = "done"
+
+    for person in people:
+        visit(person)
+    return checked
+
+
+def shape(people):
+    """
+    Return the people of a family parents first, and a key that
+    describes the family without names: for each person in that
+    order, the positions of their parents and their known trait.
+    """
+    order = heredity.topological_order(people)
+    position = {person: i for i, person in enumerate(order)}
+    key = tuple(
+        (
+            position.get(people[person]["mother"], -1),
+            position.get(people[person]["father"], -1),
+            people[person]["trait"]
+        )
+        for person in order
+    )
+    return order, key
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def compiled(key):
+    """
+    Compile the family described by `key` (see `shape`) for
+    variable elimination and return each person's gene and trait
+    distributions, by position.
+    """
+    people = {
+        i: {
+            "name": i,
+            "mother": None if mother < 0 else mother,
+            "father": None if father < 0 else father,
+            "trait": trait
+        }
+        for i, (mother, father, trait) in enumerate(key)
+    }
+    probabilities = inference.Network(people, heredity.PROBS).probabilities()
+    return [probabilities[i] for i in range(len(key))]
+
+
+def write_results(results, output):
+    """
+    Print each family's distributions as they arrive: one JSON line
+    per family, or one CSV row per person. A family that failed gets
+    a JSON line or CSV row with its error instead.
+    """
+    if output == "json":
+        for family, probabilities, error in results:
+            if error is not None:
+                print(json.dumps({"family": family, "error": error}),
+                      flush=True)
+                continue
+            print(json.dumps({
+                "family": family,
+                "people": {
+                    person: {
+                        "gene": {
+                            str(count): p
+                            for count, p in distributions["gene"].items()
+                        },
+                        "trait": distributions["trait"][True]
+                    }
+                    for person, distributions in probabilities.items()
+                }
+            }), flush=True)
+        return
+
+    writer = csv.writer(sys.stdout)
+    writer.writerow(
+        ["family", "person", "gene_0", "gene_1", "gene_2", "trait", "error"]
+    )
+    for family, probabilities, error in results:
+        if error is not None:
+            writer.writerow([family, "", "", "", "", "", error])
+        else:
+            for person, distributions in probabilities.items():
+                genes = distributions["gene"]
+                writer.writerow([
+                    family, person, genes[0], genes[1], genes[2],
+                    distributions["trait"][True], ""
+                ])
+        sys.stdout.flush()
+
+
+if __name__ == "__main__":
+    main()
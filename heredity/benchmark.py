@@ -0,0 +1,130 @@
+import random
+import sys
+import time
+
+import heredity
+
+BUNDLED_FAMILIES = ("data/family0.csv", "data/family1.csv", "data/family2.csv")
+
+# Largest synthetic pedigree to also run the original powerset loop on
+BASELINE_LIMIT = 7
+
+
+def main():
+    if len(sys.argv) > 2:
+        sys.exit("Usage: python benchmark.py [people]")
+    largest = int(sys.argv[1]) if len(sys.argv) == 2 else 9
+
+    families = [
+        (filename, heredity.load_data(filename))
+        for filename in BUNDLED_FAMILIES
+    ]
+    families += [
+        (f"synthetic, {n} people", synthetic_pedigree(n))
+        for n in range(5, largest + 1)
+    ]
+
+    for name, people in families:
+        print(f"{name}:")
+        start = time.perf_counter()
+        probabilities = heredity.enumerate_probabilities(people)
+        seconds = time.perf_counter() - start
+        print(f"  Lazy enumeration: {seconds:.3f}s")
+
+        if len(people) <= BASELINE_LIMIT:
+            start = time.perf_counter()
+            baseline = powerset_probabilities(people)
+            baseline_seconds = time.perf_counter() - start
+            print(f"  Powerset loop: {baseline_seconds:.3f}s "
+                  f"({baseline_seconds / seconds:.0f}x slower, "
+                  f"max difference {difference(baseline, probabilities):.1e})")
+
+        start = time.perf_counter()
+        vectorized = heredity.vectorize_probabilities(people)
+        vectorized_seconds = time.perf_counter() - start
+        print(f"  Vectorized enumeration: {vectorized_seconds:.3f}s "
+              f"({seconds / vectorized_seconds:.0f}x faster, "
+              f"max difference {difference(vectorized, probabilities):.1e})")
+
+        start = time.perf_counter()
+        eliminated = heredity.eliminate_probabilities(people)
+        seconds = time.perf_counter() - start
+        print(f"  Variable elimination: {seconds:.3f}s "
+              f"(max difference {difference(eliminated, probabilities):.1e})")
+
+
+def powerset_probabilities(people):
+    """
+    The original loop: every powerset combination of trait, one gene
+    and two gene sets, checking the known traits only for the first.
+    """
+    probabilities = heredity.empty_probabilities(people)
+    names = set(people)
+    for have_trait in heredity.powerset(names):
+        fails_evidence = any(
+            (people[person]["trait"] is not None and
+             people[person]["trait"] != (person in have_trait))
+            for person in names
+        )
+        if fails_evidence:
+            continue
+        for one_gene in heredity.powerset(names):
+            for two_genes in heredity.powerset(names - one_gene):
+                p = heredity.joint_probability(
+                    people, one_gene, two_genes, have_trait
+                )
+                heredity.update(
+                    probabilities, one_gene, two_genes, have_trait, p
+                )
+    heredity.normalize(probabilities)
+    return probabilities
+
+
+def synthetic_pedigree(n, observed=0.5, seed=0):
+    """
+    Return a random pedigree of `n` people in the form `load_data`
+    returns, built from couples where most partners marry in from
+    outside the family, with a fraction `observed` of known traits.
+    """
+    rng = random.Random(seed)
+    people = {}
+
+    def add(mother=None, father=None):
+        name = f"Person{len(people)}"
+        people[name] = {
+            "name": name,
+            "mother": mother,
+            "father": father,
+            "trait": (rng.random() < 0.5 if rng.random() < observed
+                      else None)
+        }
+        return name
+
+    unmarried = [add(), add()]
+    while len(people) < n:
+        person = unmarried.pop(rng.randrange(len(unmarried)))
+        if unmarried and rng.random() < 0.05:
+            partner = unmarried.pop(rng.randrange(len(unmarried)))
+        else:
+            partner = add()
+        for _ in range(rng.randint(1, 4)):
+            if len(people) >= n:
+                break
+            unmarried.append(add(person, partner))
+    return people
+
+
+def difference(a, b):
+    """
+    Return the largest difference between two sets of distributions.
+    """
+    return max(
+        abs(a[person][field][value] - b[person][field][value])
+        for person in a
+        for field in a[person]
+        for value in a[person][field]
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,13 @@
 import csv
+import functools
 import itertools
 import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import inference
 
 PROBS = {
 
@@ -36,16 +43,359 @@ PROBS = {
     "mutation": 0.01
 }
 
+# Gene assignments evaluated at once by `vectorize_probabilities`
+BATCH_SIZE = 1 << 16
+
+# Defaults for the samplers: total samples, independent chains,
+# Gibbs sweeps discarded at the start of each chain and Gibbs
+# walkers moved together within a chain
+SAMPLES = 100000
+CHAINS = 8
+BURN_IN = 100
+WALKERS = 256
+
 
 def main():
 
     # Check for proper usage
-    if len(sys.argv) != 2:
-        sys.exit("Usage: python heredity.py data.csv")
+    if not 2 <= len(sys.argv) <= 5:
+        sys.exit("Usage: python heredity.py data.csv "
+                 "[method] [samples] [seed]")
     people = load_data(sys.argv[1])
+    method = sys.argv[2] if len(sys.argv) >= 3 else "enumerate"
+    if method not in METHODS and method not in SAMPLERS:
+        sys.exit(f"Method must be one of: {', '.join([*METHODS, *SAMPLERS])}")
+
+    errors = None
+    if method in SAMPLERS:
+        n = int(sys.argv[3]) if len(sys.argv) >= 4 else SAMPLES
+        seed = int(sys.argv[4]) if len(sys.argv) == 5 else None
+        start = time.perf_counter()
+        probabilities, errors = sample_probabilities(
+            people, n, method, seed=seed
+        )
+        seconds = time.perf_counter() - start
+    else:
+        try:
+            probabilities = METHODS[method](people)
+        except ValueError as error:
+            sys.exit(str(error))
+
+    # Print results
+    for person in people:
+        print(f"{person}:")
+        for field in probabilities[person]:
+            print(f"  {field.capitalize()}:")
+            for value in probabilities[person][field]:
+                p = probabilities[person][field][value]
+                if errors is None:
+                    print(f"    {value}: {p:.4f}")
+                else:
+                    error = errors[person][field][value]
+                    print(f"    {value}: {p:.4f} ± {error:.4f}")
+
+    if errors is not None:
+        print(f"Sampled {n} with {method} in {seconds:.3f}s "
+              f"({n / seconds:.0f} samples per second)")
+
+
+def enumerate_probabilities(people):
+    """
+    Return each person's gene and trait distributions by summing
+    the joint probability of every assignment consistent with the
+    known traits.
+    """
 
     # Keep track of gene and trait probabilities for each person
-    probabilities = {
+    probabilities = empty_probabilities(people)
+
+    for assignment, p in assignments(people):
+        for person, genes in assignment.items():
+            probabilities[person]["gene"][genes] += p
+            if people[person]["trait"] is None:
+                p_trait = p * PROBS["trait"][genes][True]
+                probabilities[person]["trait"][True] += p_trait
+                probabilities[person]["trait"][False] += p - p_trait
+            else:
+                probabilities[person]["trait"][people[person]["trait"]] += p
+
+    # Ensure probabilities sum to 1
+    normalize(probabilities)
+    return probabilities
+
+
+def assignments(people):
+    """
+    Yield every assignment of gene counts with a nonzero probability,
+    as a dictionary mapping each person to their number of copies,
+    along with the joint probability of those gene counts and the
+    known traits.
+
+    Unknown traits are summed out rather than enumerated: no one's
+    genes depend on them, so both branches always add up to the
+    probability of the genes alone.
+
+    People are assigned parents first, so each person's probability
+    can be multiplied into the product of everyone before them, and
+    that partial product is shared by every assignment below it.
+    Branches made impossible by a known trait are never entered.
+    """
+    order = topological_order(people)
+    n = len(order)
+    index = {person: i for i, person in enumerate(order)}
+    parents = [
+        None if people[person]["mother"] is None else
+        (index[people[person]["mother"]], index[people[person]["father"]])
+        for person in order
+    ]
+    traits = [people[person]["trait"] for person in order]
+
+    genes = [0] * n
+    products = [1] * (n + 1)
+
+    def options(i):
+        # The (genes, probability) choices for person i
+        if parents[i] is None:
+            gene_probabilities = PROBS["gene"]
+        else:
+            gene_probabilities = inherited(
+                genes[parents[i][0]], genes[parents[i][1]]
+            )
+        if traits[i] is not None:
+            gene_probabilities = {
+                count: p * PROBS["trait"][count][traits[i]]
+                for count, p in gene_probabilities.items()
+            }
+        return [(count, p) for count, p in gene_probabilities.items() if p > 0]
+
+    if n == 0:
+        yield {}, 1
+        return
+
+    # Depth-first over people, with one iterator of choices per level
+    stack = [iter(options(0))]
+    while stack:
+        i = len(stack) - 1
+        for count, p in stack[i]:
+            genes[i] = count
+            products[i + 1] = products[i] * p
+            if i + 1 == n:
+                yield dict(zip(order, genes)), products[n]
+            else:
+                stack.append(iter(options(i + 1)))
+                break
+        else:
+            stack.pop()
+
+
+def inherited(mother, father):
+    """
+    Return the distribution of a child's gene count given how many
+    copies of the gene their mother and father have.
+    """
+    from_mother = inheritance(mother)
+    from_father = inheritance(father)
+    return {
+        2: from_mother * from_father,
+        1: from_mother * (1 - from_father) + (1 - from_mother) * from_father,
+        0: (1 - from_mother) * (1 - from_father)
+    }
+
+
+def topological_order(people):
+    """
+    Return the people in an order where parents come before
+    their children.
+    """
+    order = []
+    seen = set()
+
+    def visit(person):
+        if person in seen:
+            return
+        seen.add(person)
+        for parent in (people[person]["mother"], people[person]["father"]):
+            if parent is not None:
+                visit(parent)
+        order.append(person)
+
+    for person in people:
+        visit(person)
+    return order
+
+
+def eliminate_probabilities(people):
+    """
+    Return each person's gene and trait distributions by variable
+    elimination over the pedigree (see `inference.eliminate`).
+    """
+    return inference.eliminate(people, PROBS)
+
+
+def vectorize_probabilities(people):
+    """
+    Return each person's gene and trait distributions by evaluating
+    every gene assignment, `BATCH_SIZE` at a time, with NumPy
+    (see `log_joint_probabilities`).
+    """
+    n = len(people)
+    if n == 0:
+        return {}
+    traits = trait_codes(people)
+    gene_totals = np.zeros((n, 3))
+    trait_totals = np.zeros((n, 2))
+
+    # Probabilities are scaled by the first batch's largest, so they
+    # stay representable; normalizing cancels the scale out
+    scale = None
+    for start in range(0, 3 ** n, BATCH_SIZE):
+        genes = gene_assignments(n, start, min(start + BATCH_SIZE, 3 ** n))
+        log_p = log_joint_probabilities(people, genes, traits)
+        if scale is None:
+            scale = log_p.max()
+        update_batch(gene_totals, trait_totals, genes, traits,
+                     np.exp(log_p - scale))
+
+    return distributions(
+        people, normalize_batch(gene_totals), normalize_batch(trait_totals)
+    )
+
+
+def sample_probabilities(people, n=SAMPLES, method="likelihood",
+                         chains=CHAINS, workers=None, seed=None):
+    """
+    Estimate each person's gene and trait distributions from `n`
+    samples, split evenly between `chains` independent chains of the
+    sampler `method` (one of `SAMPLERS`), each with its own seeded
+    generator, run in a pool of `workers` processes.
+
+    Return two dictionaries in the form of `enumerate_probabilities`:
+    the estimates, and their standard errors from the spread of the
+    per-chain estimates.
+    """
+    if chains < 2:
+        raise ValueError("need at least 2 chains for a standard error")
+    seeds = np.random.SeedSequence(seed).generate_state(chains)
+    tasks = [(people, method, -(-n // chains), int(s)) for s in seeds]
+    if workers == 1:
+        results = list(map(sample_chain, tasks))
+    else:
+        with ProcessPoolExecutor(workers) as pool:
+            results = list(pool.map(sample_chain, tasks))
+
+    genes = np.array([gene_estimates for gene_estimates, _ in results])
+    traits = np.array([trait_estimates for _, trait_estimates in results])
+    return (
+        distributions(people, genes.mean(axis=0), traits.mean(axis=0)),
+        distributions(
+            people,
+            genes.std(axis=0, ddof=1) / np.sqrt(chains),
+            traits.std(axis=0, ddof=1) / np.sqrt(chains)
+        )
+    )
+
+
+def sample_chain(task):
+    """
+    Run one seeded chain of a sampler and return its estimates.
+    """
+    people, method, n, seed = task
+    return SAMPLERS[method](people, n, np.random.default_rng(seed))
+
+
+def likelihood_weighting(people, n, rng):
+    """
+    Estimate gene and trait distributions from `n` samples drawn
+    parents first from `PROBS`, with everyone with a known trait
+    given it and each sample weighted by how likely those traits are.
+
+    Return per-person arrays of gene count and (not having, having)
+    trait probabilities, using each sample's probability of an
+    unknown trait given the genes rather than drawing it.
+
+    The more traits are known, the more the weight falls on a few
+    samples, so Gibbs sampling suits large pedigrees better.
+    """
+    traits = trait_codes(people)
+    known = np.flatnonzero(traits >= 0)
+    _, _, trait_table = tables()
+    gene_totals = np.zeros((len(people), 3))
+    trait_totals = np.zeros((len(people), 2))
+
+    # Weights are kept as logs and scaled by the first batch's largest,
+    # as in `vectorize_probabilities`
+    scale = None
+    for start in range(0, n, BATCH_SIZE):
+        genes = forward_sample(people, min(BATCH_SIZE, n - start), rng)
+        log_weights = np.log(
+            trait_table[genes[:, known], traits[known]]
+        ).sum(axis=1)
+        if scale is None:
+            scale = log_weights.max()
+        update_batch(gene_totals, trait_totals, genes, traits,
+                     np.exp(log_weights - scale))
+    return normalize_batch(gene_totals), normalize_batch(trait_totals)
+
+
+def gibbs_sampling(people, n, rng, burn_in=BURN_IN):
+    """
+    Estimate gene and trait distributions from `n` Gibbs samples:
+    `WALKERS` gene assignments, each started from a draw parents first,
+    are updated one person at a time from that person's distribution
+    given everyone else, and each sweep after the first `burn_in`
+    counts as one sample per walker.
+
+    Return per-person arrays of gene count and (not having, having)
+    trait probabilities, averaging each person's conditional
+    distributions rather than the genes drawn from them.
+    """
+    order, mothers, fathers = pedigree_columns(people)
+    traits = trait_codes(people)
+    prior, inheritance_table, trait_table = tables()
+    given = trait_given_genes()
+    walkers = min(WALKERS, n)
+    gene_totals = np.zeros((len(people), 3))
+    trait_totals = np.zeros((len(people), 2))
+
+    # Each person's children, with the children's parents
+    children = [[] for _ in people]
+    for child in order:
+        if mothers[child] >= 0:
+            family = (child, mothers[child], fathers[child])
+            children[mothers[child]].append(family)
+            children[fathers[child]].append(family)
+
+    genes = forward_sample(people, walkers, rng)
+    for sweep in range(burn_in + -(-n // walkers)):
+        for i in order:
+            if mothers[i] < 0:
+                p = np.tile(prior, (walkers, 1))
+            else:
+                p = inheritance_table[
+                    :, genes[:, mothers[i]], genes[:, fathers[i]]
+                ].T.copy()
+            if traits[i] >= 0:
+                p *= trait_table[:, traits[i]]
+            for child, mother, father in children[i]:
+                child_genes = genes[:, child]
+                if i == mother:
+                    p *= inheritance_table[child_genes, :, genes[:, father]]
+                else:
+                    p *= inheritance_table[child_genes, genes[:, mother], :]
+            p /= p.sum(axis=1, keepdims=True)
+            genes[:, i] = draw(p, rng)
+            if sweep >= burn_in:
+                gene_totals[i] += p.sum(axis=0)
+                have_trait = (p @ given[:, traits[i]]).sum()
+                trait_totals[i] += (walkers - have_trait, have_trait)
+    return normalize_batch(gene_totals), normalize_batch(trait_totals)
+
+
+def empty_probabilities(people):
+    """
+    Return zeroed gene and trait distributions for each person.
+    """
+    return {
         person: {
             "gene": {
                 2: 0,
@@ -60,39 +410,6 @@ def main():
         for person in people
     }
 
-    # Loop over all sets of people who might have the trait
-    names = set(people)
-    for have_trait in powerset(names):
-
-        # Check if current set of people violates known information
-        fails_evidence = any(
-            (people[person]["trait"] is not None and
-             people[person]["trait"] != (person in have_trait))
-            for person in names
-        )
-        if fails_evidence:
-            continue
-
-        # Loop over all sets of people who might have the gene
-        for one_gene in powerset(names):
-            for two_genes in powerset(names - one_gene):
-
-                # Update probabilities with new joint probability
-                p = joint_probability(people, one_gene, two_genes, have_trait)
-                update(probabilities, one_gene, two_genes, have_trait, p)
-
-    # Ensure probabilities sum to 1
-    normalize(probabilities)
-
-    # Print results
-    for person in people:
-        print(f"{person}:")
-        for field in probabilities[person]:
-            print(f"  {field.capitalize()}:")
-            for value in probabilities[person][field]:
-                p = probabilities[person][field][value]
-                print(f"    {value}: {p:.4f}")
-
 
 def load_data(filename):
     """
@@ -139,7 +456,39 @@ def joint_probability(people, one_gene, two_genes, have_trait):
         * everyone in set `have_trait` has the trait, and
         * everyone not in set` have_trait` does not have the trait.
     """
-    raise NotImplementedError
+    probability = 1
+    for person in people:
+        genes = gene_count(person, one_gene, two_genes)
+        mother = people[person]["mother"]
+        father = people[person]["father"]
+        if mother is None and father is None:
+            probability *= PROBS["gene"][genes]
+        else:
+            probability *= inherited(
+                gene_count(mother, one_gene, two_genes),
+                gene_count(father, one_gene, two_genes)
+            )[genes]
+        probability *= PROBS["trait"][genes][person in have_trait]
+    return probability
+
+
+def gene_count(person, one_gene, two_genes):
+    """
+    Return how many copies of the gene `person` has in an assignment.
+    """
+    return 2 if person in two_genes else 1 if person in one_gene else 0
+
+
+def inheritance(genes):
+    """
+    Return the probability that a parent with `genes` copies of the
+    gene passes one on to a child, allowing for mutation.
+    """
+    if genes == 2:
+        return 1 - PROBS["mutation"]
+    if genes == 1:
+        return 0.5
+    return PROBS["mutation"]
 
 
 def update(probabilities, one_gene, two_genes, have_trait, p):
@@ -149,7 +498,10 @@ def update(probabilities, one_gene, two_genes, have_trait, p):
     Which value for each distribution is updated depends on whether
     the person is in `have_gene` and `have_trait`, respectively.
     """
-    raise NotImplementedError
+    for person in probabilities:
+        genes = gene_count(person, one_gene, two_genes)
+        probabilities[person]["gene"][genes] += p
+        probabilities[person]["trait"][person in have_trait] += p
 
 
 def normalize(probabilities):
@@ -157,7 +509,224 @@ def normalize(probabilities):
     Update `probabilities` such that each probability distribution
     is normalized (i.e., sums to 1, with relative proportions the same).
     """
-    raise NotImplementedError
+    for person in probabilities:
+        for field in probabilities[person]:
+            distribution = probabilities[person][field]
+            total = sum(distribution.values())
+            for value in distribution:
+                distribution[value] /= total
+
+
+def log_joint_probabilities(people, genes, traits):
+    """
+    Compute the log joint probability of a batch of assignments.
+
+    Each row of the integer array `genes` gives everyone's number of
+    copies of the gene, with a column per person in the order of
+    `people`. `traits` has the same shape, or is one row shared by
+    all assignments, with 1 for having the trait, 0 for not having
+    it and -1 for unknown, which is summed out.
+    """
+    log_prior, log_inherited, log_trait = log_tables()
+    index = {person: i for i, person in enumerate(people)}
+    founders = [
+        index[person] for person in people
+        if people[person]["mother"] is None
+    ]
+    children = [
+        index[person] for person in people
+        if people[person]["mother"] is not None
+    ]
+    mothers = [index[people[person]["mother"]] for person in people
+               if people[person]["mother"] is not None]
+    fathers = [index[people[person]["father"]] for person in people
+               if people[person]["mother"] is not None]
+
+    # Gathers use flat offsets into the tables, which NumPy
+    # indexes faster than several index arrays
+    return (
+        log_prior[genes[:, founders]].sum(axis=1)
+        + log_inherited.ravel()[
+            9 * genes[:, children] + 3 * genes[:, mothers] + genes[:, fathers]
+        ].sum(axis=1)
+        + log_trait.ravel()[3 * genes + traits % 3].sum(axis=1)
+    )
+
+
+def update_batch(gene_totals, trait_totals, genes, traits, p):
+    """
+    Add a batch of joint probabilities `p` of the assignments in
+    `genes` (see `log_joint_probabilities`) to the per-person arrays
+    of gene count and (not having, having) trait totals.
+    """
+    for count in range(3):
+        gene_totals[:, count] += p @ (genes == count)
+    have_trait = p @ trait_given_genes()[genes, traits]
+    trait_totals[:, 1] += have_trait
+    trait_totals[:, 0] += p.sum() - have_trait
+
+
+def normalize_batch(totals):
+    """
+    Return per-person totals scaled so each row sums to 1.
+    """
+    return totals / totals.sum(axis=1, keepdims=True)
+
+
+@functools.lru_cache(maxsize=None)
+def tables():
+    """
+    Return `PROBS` as probability tables indexed by gene count:
+    the prior, the inheritance table indexed by [child, mother,
+    father] (see `inference.inheritance_table`), and the trait table
+    indexed by [genes, trait code] whose last column, for unknown
+    traits, is one.
+
+    The tables are built once and shared, so they are read-only.
+    """
+    prior = np.array([PROBS["gene"][count] for count in range(3)])
+    inheritance_table = inference.inheritance_table(PROBS["mutation"])
+    trait = np.array([
+        [PROBS["trait"][count][False], PROBS["trait"][count][True], 1]
+        for count in range(3)
+    ])
+    return read_only(prior, inheritance_table, trait)
+
+
+@functools.lru_cache(maxsize=None)
+def log_tables():
+    """
+    Return the tables of `tables` as log probabilities.
+    """
+    with np.errstate(divide="ignore"):
+        return read_only(*(np.log(table) for table in tables()))
+
+
+@functools.lru_cache(maxsize=None)
+def trait_given_genes():
+    """
+    Return the probability of having the trait indexed by [genes,
+    trait code]: 0 or 1 when it is known, and from `PROBS` when the
+    code is -1 for unknown.
+    """
+    return read_only(np.array([
+        [0, 1, PROBS["trait"][count][True]] for count in range(3)
+    ]))[0]
+
+
+def read_only(*arrays):
+    """
+    Return `arrays` as a tuple, each marked as not writeable.
+    """
+    for array in arrays:
+        array.setflags(write=False)
+    return arrays
+
+
+def trait_codes(people):
+    """
+    Return the known traits of `people` as an array of trait codes.
+    """
+    return np.array([
+        -1 if people[person]["trait"] is None else int(people[person]["trait"])
+        for person in people
+    ])
+
+
+def forward_sample(people, size, rng):
+    """
+    Return `size` gene assignments drawn parents first from `PROBS`,
+    ignoring the known traits, as rows with a column per person.
+    """
+    order, mothers, fathers = pedigree_columns(people)
+    prior, inheritance_table, _ = tables()
+    genes = np.zeros((size, len(people)), dtype=np.int64)
+    for i in order:
+        if mothers[i] < 0:
+            p = np.broadcast_to(prior, (size, 3))
+        else:
+            p = inheritance_table[
+                :, genes[:, mothers[i]], genes[:, fathers[i]]
+            ].T
+        genes[:, i] = draw(p, rng)
+    return genes
+
+
+def pedigree_columns(people):
+    """
+    Return the column of each person in `people` order, listed
+    parents first, and arrays of the columns of each person's
+    mother and father, or -1 for people without parents listed.
+    """
+    index = {person: i for i, person in enumerate(people)}
+    order = [index[person] for person in topological_order(people)]
+    mothers = np.array([
+        -1 if people[person]["mother"] is None else
+        index[people[person]["mother"]]
+        for person in people
+    ])
+    fathers = np.array([
+        -1 if people[person]["father"] is None else
+        index[people[person]["father"]]
+        for person in people
+    ])
+    return order, mothers, fathers
+
+
+def draw(p, rng):
+    """
+    Draw one gene count per row of `p`, a (rows, 3) array of
+    probabilities summing to 1 in each row.
+    """
+    cumulative = p.cumsum(axis=1)
+    u = rng.random(len(p))[:, np.newaxis] * cumulative[:, -1:]
+    return np.minimum((u >= cumulative).sum(axis=1), 2)
+
+
+def distributions(people, genes, traits):
+    """
+    Return per-person arrays of gene count and (not having, having)
+    trait values as gene and trait dictionaries for each person.
+    """
+    return {
+        person: {
+            "gene": {
+                2: float(genes[i, 2]),
+                1: float(genes[i, 1]),
+                0: float(genes[i, 0])
+            },
+            "trait": {
+                True: float(traits[i, 1]),
+                False: float(traits[i, 0])
+            }
+        }
+        for i, person in enumerate(people)
+    }
+
+
+def gene_assignments(n, start, stop):
+    """
+    Return the gene assignments numbered `start` to `stop` of all
+    3 ** n for `n` people, one per row, counting in base 3.
+    """
+    numbers = np.arange(start, stop, dtype=np.int64)
+    powers = 3 ** np.arange(n, dtype=np.int64)
+
+    # Built a person at a time, so each person's column is contiguous
+    # for the per-person gathers and reductions
+    return (numbers // powers[:, np.newaxis] % 3).T
+
+
+METHODS = {
+    "enumerate": enumerate_probabilities,
+    "eliminate": eliminate_probabilities,
+    "vectorize": vectorize_probabilities,
+}
+
+SAMPLERS = {
+    "likelihood": likelihood_weighting,
+    "gibbs": gibbs_sampling,
+}
 
 
 if __name__ == "__main__":
@@ -0,0 +1,300 @@
+import numpy as np
+
+# Gene counts a person can have, in table axis order
+GENES = (0, 1, 2)
+
+# Most people in one clique, whose table has 3 ** MAX_CLIQUE entries
+MAX_CLIQUE = 16
+
+
+class Factor():
+    """
+    A nonnegative table over the gene counts of some people:
+    `table[a, b, ...]` is the value when the people in `variables`
+    have a, b, ... copies of the gene.
+    """
+
+    def __init__(self, variables, table):
+        self.variables = tuple(variables)
+        self.table = table
+
+
+class Network():
+    """
+    A pedigree as a Bayesian network over each person's gene count,
+    compiled for exact inference.
+
+    Each person has a factor giving the probability of their gene
+    count, unconditionally or given their parents' counts, times the
+    probability of their trait if it is known. Unknown traits are
+    left out of the network, since they do not affect anyone else, and
+    are filled in from the gene marginals at the end.
+
+    The factors are grouped into a clique tree from a min-fill
+    elimination order, so one upward and one downward pass of
+    messages gives the marginals of everyone at once. Raises
+    ValueError if a clique has more than `MAX_CLIQUE` people.
+    """
+
+    def __init__(self, people, probs):
+        self.people = people
+        self.traits = np.array([
+            [probs["trait"][genes][False], probs["trait"][genes][True]]
+            for genes in GENES
+        ])
+        prior = np.array([probs["gene"][genes] for genes in GENES])
+        inherited = inheritance_table(probs["mutation"])
+
+        factors = []
+        for person, data in people.items():
+            if data["mother"] is None:
+                factor = Factor((person,), prior.copy())
+            else:
+                factor = Factor(
+                    (person, data["mother"], data["father"]), inherited.copy()
+                )
+            if data["trait"] is not None:
+                factor.table *= self.traits[:, int(data["trait"])].reshape(
+                    (3,) + (1,) * (len(factor.variables) - 1)
+                )
+            factors.append(factor)
+
+        neighbors = moral_graph(people)
+        self.order = elimination_order(neighbors)
+        self.cliques = clique_tree(neighbors, self.order)
+        width = max(map(len, self.cliques.values()), default=0)
+        if width > MAX_CLIQUE:
+            raise ValueError(
+                f"pedigree too entangled for exact inference: a clique of "
+                f"{width} people would need a table of 3 ** {width} entries "
+                f"(limit {MAX_CLIQUE}); use a sampler instead, such as "
+                f"`python heredity.py data.csv gibbs`"
+            )
+        position = {person: i for i, person in enumerate(self.order)}
+
+        # Each factor goes to the clique of its first eliminated variable
+        self.potentials = {person: [] for person in self.order}
+        for factor in factors:
+            first = min(factor.variables, key=position.get)
+            self.potentials[first].append(factor)
+
+        # The parent of each clique is the clique of the next variable
+        # in it to be eliminated, if any
+        self.parent = {}
+        self.children = {person: [] for person in self.order}
+        for person in self.order:
+            clique = self.cliques[person]
+            self.parent[person] = clique[1] if len(clique) > 1 else None
+            if self.parent[person] is not None:
+                self.children[self.parent[person]].append(person)
+
+    def marginals(self):
+        """
+        Return a dictionary mapping each person to an array of the
+        probabilities that they have 0, 1 and 2 copies of the gene,
+        given the known traits.
+        """
+        # Upward pass, in elimination order
+        up = {}
+        for person in self.order:
+            if self.parent[person] is not None:
+                up[person] = multiply(
+                    self.potentials[person]
+                    + [up[child] for child in self.children[person]],
+                    self.cliques[person][1:]
+                )
+
+        # Downward pass, in reverse elimination order
+        down = {}
+        for person in reversed(self.order):
+            incoming = self.potentials[person] + (
+                [down[person]] if person in down else []
+            )
+            for child in self.children[person]:
+                down[child] = multiply(
+                    incoming + [
+                        up[sibling] for sibling in self.children[person]
+                        if sibling != child
+                    ],
+                    self.cliques[child][1:]
+                )
+
+        return {
+            person: multiply(
+                self.potentials[person]
+                + [up[child] for child in self.children[person]]
+                + ([down[person]] if person in down else []),
+                (person,)
+            ).table
+            for person in self.order
+        }
+
+    def probabilities(self):
+        """
+        Return each person's gene and trait distributions,
+        in the same form as `heredity.enumerate_probabilities`.
+        """
+        marginals = self.marginals()
+        probabilities = {}
+        for person, data in self.people.items():
+            genes = marginals[person]
+            if data["trait"] is None:
+                trait = genes @ self.traits[:, 1]
+            else:
+                trait = float(data["trait"])
+            probabilities[person] = {
+                "gene": {
+                    2: float(genes[2]),
+                    1: float(genes[1]),
+                    0: float(genes[0])
+                },
+                "trait": {
+                    True: float(trait),
+                    False: float(1 - trait)
+                }
+            }
+        return probabilities
+
+
+def eliminate(people, probs):
+    """
+    Return each person's gene and trait distributions given the
+    known traits, computed exactly by variable elimination.
+    """
+    return Network(people, probs).probabilities()
+
+
+def inheritance_table(mutation):
+    """
+    Return the conditional probability table of a child's gene count:
+    entry [child, mother, father] is the probability of the child
+    having `child` copies given their parents' copies.
+    """
+    passes = np.array([mutation, 0.5, 1 - mutation])
+    mother = passes[:, np.newaxis]
+    father = passes[np.newaxis, :]
+    return np.stack([
+        (1 - mother) * (1 - father),
+        mother * (1 - father) + (1 - mother) * father,
+        mother * father
+    ])
+
+
+def multiply(factors, variables):
+    """
+    Return the product of `factors`, with every variable not in
+    `variables` summed out, as a factor over `variables` scaled to
+    sum to 1 so that long chains of messages do not underflow.
+    """
+    labels = {}
+    operands = []
+    for factor in factors:
+        operands.append(factor.table)
+        operands.append([
+            labels.setdefault(variable, len(labels))
+            for variable in factor.variables
+        ])
+
+    # Variables no factor mentions are uniform
+    missing = [variable for variable in variables if variable not in labels]
+    if missing:
+        operands.append(np.ones((3,) * len(missing)))
+        operands.append([
+            labels.setdefault(variable, len(labels)) for variable in missing
+        ])
+
+    table = np.einsum(
+        *operands, [labels[variable] for variable in variables]
+    )
+    return Factor(variables, table / table.sum())
+
+
+def moral_graph(people):
+    """
+    Return the moral graph of a pedigree as a dictionary mapping each
+    person to the set of their parents, children and co-parents.
+    """
+    neighbors = {person: set() for person in people}
+    for person, data in people.items():
+        if data["mother"] is None:
+            continue
+        family = (person, data["mother"], data["father"])
+        for a in family:
+            for b in family:
+                if a != b:
+                    neighbors[a].add(b)
+    return neighbors
+
+
+def elimination_order(neighbors):
+    """
+    Return a greedy elimination order for an undirected graph, each
+    time eliminating the variable whose neighbors need the fewest new
+    edges between them (min-fill), breaking ties by fewest neighbors.
+
+    In a pedigree this peels off people without children first and
+    works inwards, keeping the cliques as small as the families allow.
+    """
+    neighbors = {
+        variable: set(adjacent) for variable, adjacent in neighbors.items()
+    }
+    scores = {variable: score(neighbors, variable) for variable in neighbors}
+    order = []
+    while scores:
+        variable = min(scores, key=scores.get)
+        order.append(variable)
+        adjacent = eliminate_variable(neighbors, variable)
+        del scores[variable]
+
+        # Only the scores of variables near the new edges change
+        affected = set(adjacent)
+        for other in adjacent:
+            affected |= neighbors[other]
+        for other in affected:
+            scores[other] = score(neighbors, other)
+    return order
+
+
+def clique_tree(neighbors, order):
+    """
+    Return the clique created by eliminating each variable of an
+    undirected graph in `order`: a tuple of the variable followed by
+    its neighbors at that point, in elimination order.
+    """
+    neighbors = {
+        variable: set(adjacent) for variable, adjacent in neighbors.items()
+    }
+    position = {variable: i for i, variable in enumerate(order)}
+    cliques = {}
+    for variable in order:
+        cliques[variable] = (variable,) + tuple(
+            sorted(neighbors[variable], key=position.get)
+        )
+        eliminate_variable(neighbors, variable)
+    return cliques
+
+
+def score(neighbors, variable):
+    """
+    Return the (fill-in, degree) of eliminating `variable` next.
+    """
+    adjacent = list(neighbors[variable])
+    fill = sum(
+        1
+        for i, a in enumerate(adjacent)
+        for b in adjacent[i + 1:]
+        if b not in neighbors[a]
+    )
+    return fill, len(adjacent)
+
+
+def eliminate_variable(neighbors, variable):
+    """
+    Remove `variable` from an undirected graph, connecting all of its
+    neighbors to each other, and return its neighbors.
+    """
+    adjacent = neighbors.pop(variable)
+    for other in adjacent:
+        neighbors[other].discard(variable)
+        neighbors[other] |= adjacent - {other}
+    return adjacent
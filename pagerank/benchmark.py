@@ -0,0 +1,184 @@
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import pagerank
+from linkgraph import LinkGraph
+
+# Largest corpus to also run the original O(N^2) iteration on
+BASELINE_LIMIT = 2000
+
+BUNDLED_CORPORA = ("corpus0", "corpus1", "corpus2")
+
+# Damping factors to compare the solvers at
+SOLVER_DAMPING = (pagerank.DAMPING, 0.95)
+
+
+def main():
+    if len(sys.argv) > 2:
+        sys.exit("Usage: python benchmark.py [pages]")
+    largest = int(sys.argv[1]) if len(sys.argv) == 2 else 100000
+
+    sizes = [size for size in (1000, 10000, 100000) if size < largest]
+    for size in sizes + [largest]:
+        corpus = synthetic_corpus(size)
+        links = sum(len(links) for links in corpus.values())
+        print(f"{size} pages, {links} links:")
+
+        start = time.perf_counter()
+        graph = LinkGraph.from_corpus(corpus)
+        built = time.perf_counter()
+        ranks, iterations = pagerank.power_iteration(graph, pagerank.DAMPING)
+        done = time.perf_counter()
+        print(f"  Link matrix: {built - start:.3f}s")
+        print(f"  Power iteration: {done - built:.3f}s "
+              f"({iterations} iterations)")
+
+        if size <= BASELINE_LIMIT:
+            start = time.perf_counter()
+            baseline = quadratic_pagerank(corpus, pagerank.DAMPING)
+            seconds = time.perf_counter() - start
+            error = sum(
+                abs(baseline[page] - rank)
+                for page, rank in graph.ranks_dict(ranks).items()
+            )
+            print(f"  Original iteration: {seconds:.3f}s "
+                  f"(L1 difference {error:.2e})")
+
+        # Warm-started update after relinking 0.1% of the pages
+        added, removed = synthetic_diff(corpus, max(1, size // 1000))
+        start = time.perf_counter()
+        updated, _, warm = pagerank.update_pagerank(
+            corpus, graph.ranks_dict(ranks), pagerank.DAMPING, added, removed
+        )
+        seconds = time.perf_counter() - start
+        _, cold = pagerank.power_iteration(
+            LinkGraph.from_corpus(updated), pagerank.DAMPING
+        )
+        print(f"  Incremental update: {seconds:.3f}s "
+              f"({warm} iterations, {cold - warm} fewer than a cold start)")
+
+        compare_solvers(graph)
+        compare_streaming(graph)
+
+    for directory in BUNDLED_CORPORA:
+        print(f"{directory}:")
+        compare_solvers(pagerank.crawl_graph(directory, cache=False))
+
+
+def compare_solvers(graph):
+    """
+    Print the iterations (or, for block iteration, the most sweeps of
+    any block) and time each solver takes to reach the default
+    tolerance at each damping factor in `SOLVER_DAMPING`.
+    """
+    for damping_factor in SOLVER_DAMPING:
+        for name, solver in pagerank.SOLVERS.items():
+            start = time.perf_counter()
+            _, iterations = solver(graph, damping_factor)
+            seconds = time.perf_counter() - start
+            print(f"  {name} (damping {damping_factor}): "
+                  f"{iterations} iterations, {seconds:.3f}s")
+
+
+def compare_streaming(graph):
+    """
+    Print the time and peak traced memory of ranking `graph` from an
+    edge list on disk, loaded into memory versus streamed from a
+    memory map (whose pages are not counted as allocations).
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "graph")
+        graph.save_edges(path)
+
+        def load_and_iterate():
+            return pagerank.power_iteration(
+                LinkGraph.load_edges(path), pagerank.DAMPING
+            )[0]
+
+        def stream():
+            return pagerank.stream_pagerank(path, pagerank.DAMPING)[0]
+
+        results = []
+        for name, rank in (("In memory", load_and_iterate),
+                           ("Streamed", stream)):
+            tracemalloc.start()
+            start = time.perf_counter()
+            results.append(rank())
+            seconds = time.perf_counter() - start
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(f"  {name} from edge list: {seconds:.3f}s, "
+                  f"peak {peak / 2 ** 20:.1f} MiB")
+        error = abs(results[0] - results[1]).sum()
+        print(f"  Streamed L1 difference: {error:.2e}")
+
+
+def synthetic_corpus(n, mean_links=10, dangling=0.05, seed=0):
+    """
+    Return a random corpus of `n` pages where a fraction `dangling`
+    of pages have no links and the rest link to about `mean_links`
+    pages, preferring pages with low numbers so ranks are skewed.
+    """
+    rng = random.Random(seed)
+    pages = [f"{i}.html" for i in range(n)]
+    corpus = {}
+    for page in pages:
+        if rng.random() < dangling:
+            corpus[page] = set()
+            continue
+        k = min(n - 1, max(1, int(rng.expovariate(1 / mean_links))))
+        corpus[page] = {
+            pages[int(n * rng.random() ** 2)] for _ in range(k)
+        } - {page}
+    return corpus
+
+
+def synthetic_diff(corpus, k, seed=0):
+    """
+    Return (added, removed) link diffs that move one link of each of
+    `k` random pages to another page, and add one new page linking to
+    and linked from an existing page.
+    """
+    rng = random.Random(seed)
+    pages = sorted(corpus)
+    added, removed = {}, {}
+    for page in rng.sample(pages, k):
+        if corpus[page]:
+            removed[page] = {rng.choice(sorted(corpus[page]))}
+        added[page] = {rng.choice(pages)}
+    new_page = f"{len(pages)}.html"
+    added[new_page] = {rng.choice(pages)}
+    added.setdefault(rng.choice(pages), set()).add(new_page)
+    return added, removed
+
+
+def quadratic_pagerank(corpus, damping_factor):
+    """
+    The original iteration: every page rescans every other page on
+    each sweep, with pages without links spread over all pages.
+    """
+    n = len(corpus)
+    page_rank = {page: 1 / n for page in corpus}
+    accurate = False
+    while not accurate:
+        accurate = True
+        dangling = sum(page_rank[page] for page in corpus if not corpus[page])
+        new_rank = {}
+        for page in corpus:
+            total = dangling / n
+            for other in corpus:
+                if page in corpus[other]:
+                    total += page_rank[other] / len(corpus[other])
+            new_rank[page] = (1 - damping_factor) / n + damping_factor * total
+            if abs(new_rank[page] - page_rank[page]) > 1e-10:
+                accurate = False
+        page_rank = new_rank
+    return page_rank
+
+
+if __name__ == "__main__":
+    main()
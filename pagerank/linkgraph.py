@@ -0,0 +1,182 @@
+import json
+import os
+import struct
+
+import numpy as np
+import scipy.sparse
+
+# Bump whenever the cache layout below changes
+VERSION = 1
+
+MAGIC = b"LINKGRPH"
+
+# Magic, version and header length, then the JSON header
+PREFIX = struct.Struct("<8sII")
+
+
+class LinkGraph():
+    """
+    A corpus as a sparse link matrix: pages are numbered by their
+    position in `pages`, and the pages linked to by page `i` are
+    `indices[indptr[i]:indptr[i + 1]]` (CSR rows).
+    """
+
+    def __init__(self, pages, indptr, indices):
+        self.pages = pages
+        self.index = {page: i for i, page in enumerate(pages)}
+        self.indptr = indptr
+        self.indices = indices
+        self.outdegree = np.diff(indptr)
+        self.dangling = self.outdegree == 0
+
+        # Source page of each link, in the same order as `indices`
+        self.sources = np.repeat(
+            np.arange(len(pages), dtype=indices.dtype), self.outdegree
+        )
+
+        # Column-stochastic link matrix: entry (j, i) is the share of
+        # page i's rank passed to page j
+        self.matrix = scipy.sparse.csr_matrix(
+            (1 / self.outdegree[self.sources], (indices, self.sources)),
+            shape=(len(pages), len(pages))
+        )
+
+    def __len__(self):
+        return len(self.pages)
+
+    @classmethod
+    def from_corpus(cls, corpus):
+        """
+        Build a graph from a corpus dictionary as returned by `crawl`.
+        Links from a page to itself are ignored.
+        """
+        pages = sorted(corpus)
+        index = {page: i for i, page in enumerate(pages)}
+        indptr = np.zeros(len(pages) + 1, dtype=np.int64)
+        indices = []
+        for i, page in enumerate(pages):
+            links = sorted(index[link] for link in corpus[page] if link != page)
+            indices.extend(links)
+            indptr[i + 1] = len(indices)
+        return cls(pages, indptr, np.array(indices, dtype=np.int32))
+
+    @classmethod
+    def load_edges(cls, path):
+        """
+        Load a graph written by `save_edges`.
+        """
+        with open(f"{path}.pages", encoding="utf-8") as f:
+            pages = f.read().split("\n")[:-1]
+        edges = np.fromfile(f"{path}.edges", dtype="<i4").reshape(-1, 2)
+        counts = np.bincount(edges[:, 0], minlength=len(pages))
+        indptr = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+        return cls(pages, indptr, edges[:, 1].astype(np.int32))
+
+    def save_edges(self, path):
+        """
+        Write the graph as `path.pages`, one page name per line in
+        page id order, and `path.edges`, each link as a little-endian
+        int32 (source id, target id) pair sorted by source then target.
+        """
+        with open(f"{path}.pages", "w", encoding="utf-8") as f:
+            f.writelines(f"{page}\n" for page in self.pages)
+        edges = np.empty((len(self.indices), 2), dtype="<i4")
+        edges[:, 0] = self.sources
+        edges[:, 1] = self.indices
+        edges.tofile(f"{path}.edges")
+
+    def save(self, path, key):
+        """
+        Write the graph to a cache file at `path`, tagged with `key`.
+
+        Layout: prefix, JSON header (key and sizes), the page names
+        joined by newlines, then `indptr` as int64 and `indices` as
+        int32, little-endian and 8-byte aligned.
+        """
+        names = "\n".join(self.pages).encode("utf-8")
+        header = json.dumps({
+            "key": key,
+            "pages": len(self.pages),
+            "links": len(self.indices),
+            "names": len(names),
+        }).encode()
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "wb") as f:
+            f.write(PREFIX.pack(MAGIC, VERSION, len(header)))
+            f.write(header)
+            f.write(names)
+            f.write(bytes(-f.tell() % 8))
+            f.write(self.indptr.astype("<i8").tobytes())
+            f.write(self.indices.astype("<i4").tobytes())
+        os.replace(temporary, path)
+
+    @classmethod
+    def load(cls, path, key):
+        """
+        Load a graph cached by `save`, or return None if there is no
+        cache at `path` or it was saved with another key or version.
+        """
+        try:
+            with open(path, "rb") as f:
+                contents = f.read()
+            magic, version, length = PREFIX.unpack_from(contents)
+            if magic != MAGIC or version != VERSION:
+                return None
+            offset = PREFIX.size
+            header = json.loads(contents[offset:offset + length])
+            if header["key"] != key:
+                return None
+            offset += length
+            names = contents[offset:offset + header["names"]].decode("utf-8")
+            offset += header["names"]
+            offset += -offset % 8
+            indptr = np.frombuffer(
+                contents, dtype="<i8", count=header["pages"] + 1, offset=offset
+            )
+            offset += indptr.nbytes
+            indices = np.frombuffer(
+                contents, dtype="<i4", count=header["links"], offset=offset
+            )
+        except (OSError, struct.error, ValueError, KeyError):
+            return None
+        pages = names.split("\n") if header["pages"] else []
+        return cls(pages, indptr.astype(np.int64), indices.astype(np.int32))
+
+    def to_corpus(self):
+        """
+        Return the graph as a corpus dictionary like `crawl` returns.
+        """
+        return {
+            page: {
+                self.pages[j]
+                for j in self.indices[self.indptr[i]:self.indptr[i + 1]]
+            }
+            for i, page in enumerate(self.pages)
+        }
+
+    def spread(self, ranks):
+        """
+        Return the rank each page receives through links when every
+        page splits `ranks` evenly across its links (one sparse
+        mat-vec with the column-stochastic link matrix). Rank on
+        dangling pages is not passed on.
+
+        `ranks` may also be a matrix with one rank vector per column.
+        """
+        return self.matrix @ ranks
+
+    def ranks_dict(self, ranks):
+        """
+        Return a rank vector as a {page: rank} dictionary.
+        """
+        return {page: float(rank) for page, rank in zip(self.pages, ranks)}
+
+
+def as_graph(corpus):
+    """
+    Return `corpus` as a `LinkGraph`, converting it if it is
+    a corpus dictionary.
+    """
+    if isinstance(corpus, LinkGraph):
+        return corpus
+    return LinkGraph.from_corpus(corpus)